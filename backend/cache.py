@@ -0,0 +1,64 @@
+# 本地快取共用設定
+import os
+import tempfile
+from pathlib import Path
+
+# 快取根目錄：可用環境變數 MARKETINFO_CACHE_DIR 覆寫，預設為 <專案>/.cache
+CACHE_ROOT = Path(
+    os.environ.get(
+        "MARKETINFO_CACHE_DIR", Path(__file__).resolve().parents[1] / ".cache"
+    )
+)
+
+
+def cache_dir(name):
+    """取得（並建立）指定名稱的快取子目錄。"""
+    path = CACHE_ROOT / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def atomic_write(path, write):
+    """先寫入同目錄的暫存檔再以 os.replace 取代，避免多個工作階段讀到寫一半的檔案。
+
+    write 為接收暫存檔路徑的函數，例如 lambda p: df.to_parquet(p)。
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def safe_name(symbol):
+    """代號轉為可用於檔名的字串（大寫，路徑分隔字元改為底線）。"""
+    return symbol.upper().replace("/", "_").replace(os.sep, "_")
+
+
+def cache_path(kind, symbol, suffix=""):
+    """取得代號在指定快取子目錄下的路徑，例如 cache_path("prices", "AAPL", ".parquet")。"""
+    return cache_dir(kind) / f"{safe_name(symbol)}{suffix}"
+
+
+def prune(folder, pattern, keep):
+    """目錄中符合 pattern 的檔案只保留修改時間最新的 keep 個。"""
+    files = []
+    for f in Path(folder).glob(pattern):
+        try:
+            files.append((f.stat().st_mtime, f))
+        except OSError:
+            # 其他工作階段已刪除
+            continue
+    if len(files) <= keep:
+        return
+    files.sort(key=lambda item: item[0])
+    for _, old in files[: len(files) - keep]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
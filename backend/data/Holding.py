@@ -14,6 +14,8 @@ import plotly  # Plotly 主模組
 # Streamlit 前端框架
 import streamlit as st  # Streamlit 模組
 
+from backend.data.figures import figures  # 圖表建構工具
+
 # 8.機構評級
 class Holding:
     tran_dict = {
@@ -134,24 +136,32 @@ class Holding:
             )
             df.rename(columns=Holding.tran_dict, inplace=True)
 
-            # 繪製圖表
+            # 繪製圖表：上調、下調各一條 trace，每家機構一段線，段與段之間以 None 分隔
+            price_start = df["目標價格起始"].to_numpy()
+            price_end = df["目標價格結束"].to_numpy()
+            outer = df["分析機構"].to_numpy()
+            text_start = ("$" + df["目標價格起始"].astype(str)).to_numpy()
+            text_end = ("$" + df["目標價格結束"].astype(str)).to_numpy()
+            rising = price_end >= price_start
+
             fig1 = go.Figure()
-            for i, row in df.iterrows():
+            for mask, color in ((rising, "blue"), (~rising, "red")):
+                if not mask.any():
+                    continue
+                x, y, text = figures.segments(
+                    price_start[mask],
+                    price_end[mask],
+                    outer[mask],
+                    (text_start[mask], text_end[mask]),
+                )
                 fig1.add_trace(
                     go.Scatter(
-                        x=[row["目標價格起始"], row["目標價格結束"]],
-                        y=[row["分析機構"], row["分析機構"]],
+                        x=x,
+                        y=y,
                         mode="lines+markers+text",
-                        line=dict(
-                            color=(
-                                "blue"
-                                if row["目標價格結束"] >= row["目標價格起始"]
-                                else "red"
-                            ),
-                            width=2,
-                        ),
+                        line=dict(color=color, width=2),
                         marker=dict(size=10),
-                        text=[f"${row['目標價格起始']}", f"${row['目標價格結束']}"],
+                        text=text,
                         textposition="top center",
                     )
                 )
@@ -160,7 +170,12 @@ class Holding:
                 title=f"機構對 {symbol} 目標價格變化",
                 xaxis_title="目標價格",
                 yaxis_title="機構",
-                yaxis=dict(type="category"),
+                # 分成兩條 trace 後仍維持原本資料順序排列機構
+                yaxis=dict(
+                    type="category",
+                    categoryorder="array",
+                    categoryarray=list(pd.unique(outer)),
+                ),
                 showlegend=False,
             )
 
@@ -1,10 +1,40 @@
+import concurrent.futures
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
 import yfinance as yf  # 股票數據
+import numpy as np  # 數值運算
 import pandas as pd  # 資料處理
+import plotly.graph_objects as go  # 繪圖
 import streamlit as st  # Streamlit 模組
 
+from backend.data.greeks import blackscholes  # 希臘字母與隱含波動率
+
 
 # 6.期權數據
 class Option:
+    # 期權鏈與到期日清單的有效秒數
+    ttl = 5 * 60
+    # 記憶體中最多保留的期權鏈數
+    max_chains = 128
+    # 記憶體中最多保留的代號數（yf.Ticker 與到期日清單）
+    max_symbols = 64
+    # 同時取得期權鏈的執行緒數
+    max_workers = 8
+    # 所有執行緒合計的兩次請求最短間隔秒數（全域限速）
+    min_interval = 0.1
+    # 波動率曲面與未平倉量熱圖顯示的行使價範圍（相對標的價格）
+    strike_range = 0.3
+    # 行程內共用（Streamlit 每次重跑都會建立新的 Option）
+    _tickers = OrderedDict()
+    _dates = OrderedDict()
+    _chains = OrderedDict()
+    _lock = threading.Lock()
+    _rate_lock = threading.Lock()
+    _next_request = 0.0
+
     def __init__(self, symbol):
         self.symbol = symbol
         self.tran_dict = {
@@ -22,21 +52,220 @@ class Option:
             "inTheMoney": "實值",
             "contractSize": "合約大小",
             "currency": "貨幣",
+            "type": "類型",
+            "expiry": "到期日",
+            "dte": "剩餘天數",
+            "iv": "隱含波動率(重算)",
+            "delta": "Delta",
+            "gamma": "Gamma",
+            "theta": "Theta(每日)",
+            "vega": "Vega(每1%)",
+            "rho": "Rho(每1%)",
         }
 
+    @staticmethod
+    def _remember(cache, key, value):
+        """寫入依最近使用排序的快取，超過 max_symbols 時移除最久未用的代號（呼叫端需持有 _lock）。"""
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > Option.max_symbols:
+            cache.popitem(last=False)
+
+    def ticker(self, refresh=False):
+        """同一代號共用一個 yf.Ticker；超過 ttl 或 refresh 時重建（yf.Ticker 會自行保存到期日與報價）。"""
+        with Option._lock:
+            cached = Option._tickers.get(self.symbol)
+            if refresh or cached is None or time.time() - cached[0] >= Option.ttl:
+                cached = (time.time(), yf.Ticker(self.symbol))
+            Option._remember(Option._tickers, self.symbol, cached)
+        return cached[1]
+
     def get_option_dates(self):
-        stock = yf.Ticker(self.symbol)
-        return stock.options
+        """尚未到期的到期日清單（YYYY-MM-DD），ttl 內重複查詢直接使用快取。"""
+        with Option._lock:
+            cached = Option._dates.get(self.symbol)
+            if cached is not None and time.time() - cached[0] < Option.ttl:
+                Option._dates.move_to_end(self.symbol)
+            else:
+                cached = None
+        if cached is None:
+            cached = (time.time(), tuple(self.ticker(refresh=True).options))
+            with Option._lock:
+                Option._remember(Option._dates, self.symbol, cached)
+        today = datetime.date.today().isoformat()
+        return tuple(date for date in cached[1] if date >= today)
+
+    def option_chain(self, date):
+        """取得 (代號, 到期日) 的期權鏈，ttl 內重複查詢直接使用快取。"""
+        key = (self.symbol, date)
+        with Option._lock:
+            cached = Option._chains.get(key)
+            if cached is not None and time.time() - cached[0] < Option.ttl:
+                Option._chains.move_to_end(key)
+                return cached[1]
+        Option._throttle()
+        chain = self.ticker().option_chain(date)
+        with Option._lock:
+            Option._chains[key] = (time.time(), chain)
+            Option._chains.move_to_end(key)
+            while len(Option._chains) > Option.max_chains:
+                Option._chains.popitem(last=False)
+        return chain
+
+    @staticmethod
+    def _throttle():
+        """全域限速：等到距離上一次請求至少 min_interval 秒。"""
+        with Option._rate_lock:
+            now = time.monotonic()
+            wait = Option._next_request - now
+            Option._next_request = max(now, Option._next_request) + Option.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def underlying_price(self, date=None):
+        """標的價格：優先使用期權鏈附帶的報價。"""
+        date = date or self.get_option_dates()[0]
+        underlying = getattr(self.option_chain(date), "underlying", None) or {}
+        price = underlying.get("regularMarketPrice")
+        if price:
+            return float(price)
+        return float(self.ticker().fast_info["last_price"])
+
+    def spot(self, date=None):
+        """標的價格，取不到時回傳 None。"""
+        try:
+            return self.underlying_price(date)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _chain_frame(chain, expiry, today):
+        """將單一到期日的期權鏈轉為一張表，加上類型、到期日與剩餘天數欄。"""
+        frames = []
+        for kind, df in (("call", chain.calls), ("put", chain.puts)):
+            df = df.copy()
+            df.insert(1, "type", kind)
+            frames.append(df)
+        df = pd.concat(frames, ignore_index=True)
+        expiry = pd.Timestamp(expiry)
+        df.insert(2, "expiry", expiry)
+        df.insert(3, "dte", max((expiry - today).days, 0))
+        return df
+
+    def expiry_frame(self, date):
+        """單一到期日的買權與賣權合併為一張表（欄位與 surface 相同）。"""
+        return Option._chain_frame(self.option_chain(date), date, pd.Timestamp.today().normalize())
+
+    def surface(self, dates=None, max_workers=None):
+        """平行取得所有到期日的期權鏈，合併為一張表（每個到期日仍經過期權鏈快取）。
+
+        取得失敗的到期日略過。
+        """
+        dates = list(self.get_option_dates() if dates is None else dates)
+        today = pd.Timestamp.today().normalize()
+
+        def load(date):
+            try:
+                return Option._chain_frame(self.option_chain(date), date, today)
+            except Exception:
+                return None
+
+        workers = max(1, min(max_workers or Option.max_workers, len(dates) or 1))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            frames = [df for df in executor.map(load, dates) if df is not None and not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=["contractSymbol", "type", "expiry", "dte", "strike"])
+        df = pd.concat(frames, ignore_index=True)
+        df["type"] = df["type"].astype("category")
+        return df
+
+    @staticmethod
+    def _near(surface, spot):
+        """只保留標的價格附近的行使價。"""
+        if not spot:
+            return surface
+        low, high = spot * (1 - Option.strike_range), spot * (1 + Option.strike_range)
+        return surface[surface["strike"].between(low, high)]
+
+    @staticmethod
+    def iv_surface_figure(surface, spot=None):
+        """隱含波動率曲面：行使價 × 剩餘天數，取價外合約（行使價高於標的用買權，低於用賣權）。"""
+        df = Option._near(surface, spot)
+        if spot:
+            otm = np.where(df["type"] == "call", df["strike"] >= spot, df["strike"] < spot)
+            df = df[otm]
+        df = df[df["impliedVolatility"] > 0.001]
+        grid = df.pivot_table(index="strike", columns="dte", values="impliedVolatility", aggfunc="mean")
+        fig = go.Figure(
+            go.Surface(
+                x=grid.columns.to_numpy(),
+                y=grid.index.to_numpy(),
+                z=grid.to_numpy() * 100,
+                colorscale="Viridis",
+                colorbar=dict(title="IV (%)"),
+            )
+        )
+        fig.update_layout(
+            scene=dict(xaxis_title="剩餘天數", yaxis_title="行使價", zaxis_title="隱含波動率(%)"),
+            height=600,
+            margin=dict(l=0, r=0, t=30, b=0),
+        )
+        return fig
+
+    @staticmethod
+    def oi_heatmap_figure(surface, spot=None):
+        """未平倉量熱圖：行使價 × 到期日，買權與賣權合計。"""
+        df = Option._near(surface, spot)
+        grid = df.pivot_table(index="strike", columns="expiry", values="openInterest", aggfunc="sum", fill_value=0)
+        fig = go.Figure(
+            go.Heatmap(
+                x=grid.columns.strftime("%Y-%m-%d"),
+                y=grid.index.to_numpy(),
+                z=grid.to_numpy(),
+                colorscale="Blues",
+                colorbar=dict(title="未平倉量"),
+            )
+        )
+        fig.update_layout(xaxis_title="到期日", yaxis_title="行使價", height=600)
+        return fig
+
+    def plot_surface(self):
+        """取得所有到期日並繪製隱含波動率曲面與未平倉量熱圖，回傳合併後的期權表。"""
+        surface = self.surface()
+        if surface.empty:
+            st.error("查無期權數據")
+            return surface
+        spot = self.spot()
+        st.subheader(f"{self.symbol} 隱含波動率曲面（{surface['expiry'].nunique()} 個到期日）")
+        st.plotly_chart(Option.iv_surface_figure(surface, spot), use_container_width=True)
+        st.subheader(f"{self.symbol} 未平倉量分布")
+        st.plotly_chart(Option.oi_heatmap_figure(surface, spot), use_container_width=True)
+        return surface
+
+    def add_greeks(self, df, kind=None, expiry=None):
+        """為期權表加上重算的隱含波動率與希臘字母。
+
+        單一到期日的買權或賣權表沒有 type、dte 欄，需另外指定 kind（call/put）與到期日。
+        """
+        if df.empty:
+            return df
+        df = df.copy()
+        if "type" not in df:
+            df["type"] = kind
+        if "dte" not in df:
+            today = pd.Timestamp.today().normalize()
+            df["dte"] = max((pd.Timestamp(expiry) - today).days, 0)
+        spot = self.spot(expiry)
+        if spot is None:
+            return df
+        return blackscholes.chain(df, spot)
 
     def options_calls_date(self, date):
-        stock = yf.Ticker(self.symbol)
-        option_chain = stock.option_chain(date)
-        return option_chain.calls
+        # 回傳副本，tran_col 會直接修改欄名
+        return self.option_chain(date).calls.copy()
 
     def options_puts_date(self, date):
-        stock = yf.Ticker(self.symbol)
-        option_chain = stock.option_chain(date)
-        return option_chain.puts
+        return self.option_chain(date).puts.copy()
 
     def tran_col(self, df):
         """Translate DataFrame column names to Chinese."""
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 # 資料分析
 import pandas as pd  # 資料處理
-import json  # JSON 處理
 import os
 
 # 資料擷取與網路相關
@@ -11,14 +10,15 @@ import yfinance as yf  # 股票數據
 import folium  # 地圖繪製
 from streamlit_folium import folium_static  # Folium 與 Streamlit 整合
 from geopy.geocoders import Nominatim, Photon, ArcGIS  # 地理編碼
-from geopy.exc import GeocoderTimedOut, GeocoderUnavailable, GeocoderInsufficientPrivileges
 from geopy.extra.rate_limiter import RateLimiter
-from functools import lru_cache
-import time
+import concurrent.futures
 
 # Streamlit 前端框架
 import streamlit as st  # Streamlit 模組
 
+from backend.data.infocache import infocache  # 公司資訊快取
+from backend.data.geocache import geocache  # 地理編碼快取
+
 
 # ===============================
 # 全域地理編碼設定（含備援）
@@ -30,8 +30,12 @@ USE_FALLBACK_GEOCODER = True
 # 注意：請換成你可以被聯絡的 email 或網站（符合 Nominatim 使用規範）
 _USER_AGENT = "marketkinfo/1.0 (+mailto:your_email@example.com)"
 
+# Nominatim 伺服器：可用環境變數改指向自架或本地替身服務（如 localhost:8080、http）
+NOMINATIM_DOMAIN = os.environ.get("MARKETINFO_NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = os.environ.get("MARKETINFO_NOMINATIM_SCHEME", "https")
+
 # 主要：Nominatim
-_GEOLocator = Nominatim(user_agent=_USER_AGENT)
+_GEOLocator = Nominatim(user_agent=_USER_AGENT, domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME)
 _GEOCODE = RateLimiter(
     _GEOLocator.geocode,
     min_delay_seconds=1.0,   # Nominatim 建議 >= 1 秒
@@ -50,72 +54,83 @@ _ARCGIS_GEOCODE = RateLimiter(
     _ARCGIS.geocode, min_delay_seconds=0.5, max_retries=2, error_wait_seconds=1.0, swallow_exceptions=False
 )
 
-# （可選）本地已知地標快取（避免每次都打 API；你可自行擴充）
+# （可選）本地已知地標（避免每次都打 API；你可自行擴充），啟動時寫入地理編碼快取
 _HARDCODED_COORDS = {
     # "完整地址字串（不分大小寫）": (緯度, 經度)
     "one apple park way, cupertino, united states": (37.3349, -122.0090),
 }
+geocache.put_many(_HARDCODED_COORDS, "hardcoded")
 
 
-@lru_cache(maxsize=1024)
 def _geocode_once(provider: str, query: str):
-    """對特定 provider + query 做記憶化，避免重複打 API。"""
+    """對特定 provider + query 查詢，結果（含查無結果）存入跨行程共用的地理編碼快取。
+
+    回傳 (緯度, 經度) 或 None；暫時性錯誤直接拋出且不寫入快取。
+    """
     q = query.strip()
     if not q:
         return None
+    cached = geocache.lookup(q, provider)
+    if cached is not geocache.MISSING:
+        return cached
     if provider == "nominatim":
-        return _GEOCODE(q)
+        loc = _GEOCODE(q)
     elif provider == "photon":
-        return _PHOTON_GEOCODE(q)
+        loc = _PHOTON_GEOCODE(q)
     elif provider == "arcgis":
-        return _ARCGIS_GEOCODE(q)
+        loc = _ARCGIS_GEOCODE(q)
     else:
         return None
+    result = (loc.latitude, loc.longitude) if loc else None
+    geocache.put(q, provider, result)
+    return result
 
 
 def _lookup_hardcoded(query: str):
-    """先查本地硬編碼地標（完全不打 API）。"""
+    """先查本地已知地標與地理編碼快取中任一服務查到的座標（完全不打 API）。"""
     key = query.lower().strip()
-    return _HARDCODED_COORDS.get(key)
+    return _HARDCODED_COORDS.get(key) or geocache.best(query)
 
 
-def _geocode_with_fallback(query: str):
-    """三段式備援：Nominatim → Photon → ArcGIS，皆失敗回傳 None。"""
-    # 0) 本地硬編碼
-    hc = _lookup_hardcoded(query)
-    if hc:
-        return ("hardcoded", hc[0], hc[1])
+# 主要服務超過此秒數沒有回應時，同時向備援服務發出請求
+_HEDGE_DELAY = 1.0
+# 各服務請求（每個服務的 RateLimiter 會各自控制頻率）
+_PROVIDER_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=6, thread_name_prefix="geocode")
+# 整個定位流程（在背景執行，不佔用頁面繪製）
+_LOCATE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="locate")
 
-    # 1) Nominatim
-    try:
-        loc = _geocode_once("nominatim", query)
-        if loc:
-            return ("nominatim", loc.latitude, loc.longitude)
-    except (GeocoderTimedOut, GeocoderUnavailable, GeocoderInsufficientPrivileges):
-        pass
-    except Exception:
-        pass
-
-    if not USE_FALLBACK_GEOCODER:
-        return (None, None, None)
 
-    # 2) Photon
+def _geocode_safe(provider: str, query: str):
+    """查詢單一服務，任何錯誤都視為查無結果。"""
     try:
-        loc = _geocode_once("photon", query)
-        if loc:
-            return ("photon", loc.latitude, loc.longitude)
+        return _geocode_once(provider, query)
     except Exception:
-        pass
+        return None
 
-    # 3) ArcGIS
-    try:
-        loc = _geocode_once("arcgis", query)
-        if loc:
-            return ("arcgis", loc.latitude, loc.longitude)
-    except Exception:
-        pass
 
-    return (None, None, None)
+def _geocode_hedged(query: str):
+    """先查快取；再向 Nominatim 請求，逾 _HEDGE_DELAY 秒未回應或失敗時同時向備援服務請求，
+    採用最先回傳的座標，皆失敗回傳 None。"""
+    hc = _lookup_hardcoded(query)
+    if hc:
+        return (hc[0], hc[1])
+
+    hedges = ["photon", "arcgis"] if USE_FALLBACK_GEOCODER else []
+    pending = {_PROVIDER_EXECUTOR.submit(_geocode_safe, "nominatim", query)}
+    while pending:
+        done, pending = concurrent.futures.wait(
+            pending,
+            timeout=_HEDGE_DELAY if hedges else None,
+            return_when=concurrent.futures.FIRST_COMPLETED,
+        )
+        for future in done:
+            if future.result():
+                # 其餘請求在背景完成後仍會寫入快取
+                return future.result()
+        if hedges:
+            pending |= {_PROVIDER_EXECUTOR.submit(_geocode_safe, p, query) for p in hedges}
+            hedges = []
+    return None
 
 
 # ===============================
@@ -127,32 +142,17 @@ class cominfo:
         self.com_info = self.get_cominfo()
 
     def get_cominfo(self):
-        """讀取公司詳情（相容 yfinance 舊 .info / 新 .get_info()），並保存為 df.json。"""
-        stock = yf.Ticker(self.symbol)
+        """讀取公司詳情（相容 yfinance 舊 .info / 新 .get_info()），先查本地公司資訊快取。"""
 
-        # 兼容不同版本 yfinance：優先使用 get_info()，退回 .info
-        com_info = {}
-        try:
+        def fetch():
+            stock = yf.Ticker(self.symbol)
+            # 兼容不同版本 yfinance：優先使用 get_info()，退回 .info
             if hasattr(stock, "get_info"):
-                com_info = stock.get_info() or {}
-            else:
-                com_info = getattr(stock, "info", {}) or {}
-        except Exception as e:
-            # 無法取得資訊時，避免整個中斷
-            com_info = {}
-
-        # 儲存 JSON（可用於除錯或離線查看）
-        try:
-            with open("df.json", "w", encoding="utf-8") as outfile:
-                json.dump(com_info, outfile, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
+                return stock.get_info() or {}
+            return getattr(stock, "info", {}) or {}
 
-        # 直接回傳 dict（若你想強制從檔案讀，也可打開以下程式碼）
-        # with open("df.json", "r", encoding="utf-8") as infile:
-        #     json_data = json.load(infile)
-        # return json_data
-        return com_info
+        # 無法取得資訊時回傳空字典（或過期的快取），避免整個中斷
+        return infocache.get(self.symbol, fetch)
 
     def categorize_info(self):
         """將公司資訊分門別類成五大區塊 + 其他。"""
@@ -250,7 +250,8 @@ class cominfo:
         st.subheader(f"{self.symbol}-其他訊息")
         st.write(pd.DataFrame([other_info]))
 
-    def _candidate_queries(self, address: str, city: str, country: str):
+    @staticmethod
+    def _candidate_queries(address: str, city: str, country: str):
         """組裝一系列地理查詢候選（從精確到粗略）。"""
         # 忽略空值，組裝查詢
         parts_full = [p for p in [address, city, country] if p]
@@ -263,50 +264,30 @@ class cominfo:
             queries.append(", ".join(parts_city))
         return queries
 
-    def get_location(self, address, city, country):
+    def _locate(self, address, city, country):
+        """依序嘗試候選查詢（從精確到粗略），每個候選都同時向多個服務請求。"""
+        for q in self._candidate_queries(address, city, country):
+            location = _geocode_hedged(q)
+            if location:
+                return location
+        return None
+
+    def locate_async(self, address, city, country):
+        """在背景取得公司地理座標，回傳 Future（結果為 (lat, lon) 或 None）。"""
+        return _LOCATE_EXECUTOR.submit(self._locate, address, city, country)
+
+    def get_location(self, address, city, country, timeout=None):
         """
         取得公司地理座標：
-        - 先查本地硬編碼
-        - 再依序嘗試 Nominatim / Photon / ArcGIS（取決於 USE_FALLBACK_GEOCODER）
-        - 過程中加入退避重試，不讓整個 App 因暫時性錯誤而崩潰
-        - 全部失敗回傳 None
+        - 先查本地已知地標與地理編碼快取
+        - 再向 Nominatim 請求，慢或失敗時同時向 Photon / ArcGIS 請求（取決於 USE_FALLBACK_GEOCODER）
+        - 超過 timeout 秒或全部失敗回傳 None
         """
-        candidates = self._candidate_queries(address, city, country)
-        if not candidates:
+        try:
+            return self.locate_async(address, city, country).result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
             return None
 
-        # 先看完整地址是否存在本地硬編碼（降低 API 依賴）
-        for q in candidates:
-            hc = _lookup_hardcoded(q)
-            if hc:
-                return (hc[0], hc[1])
-
-        # 逐一嘗試候選查詢：每個候選都做短暫退避重試
-        for q in candidates:
-            # 主要：帶備援的查詢
-            try:
-                src, lat, lon = _geocode_with_fallback(q)
-                if src:
-                    return (lat, lon)
-            except (GeocoderTimedOut, GeocoderUnavailable, GeocoderInsufficientPrivileges):
-                # 短暫錯誤 → 退避重試 2 次
-                for i in range(2):
-                    time.sleep(2 * (i + 1))
-                    try:
-                        src, lat, lon = _geocode_with_fallback(q)
-                        if src:
-                            return (lat, lon)
-                    except (GeocoderTimedOut, GeocoderUnavailable, GeocoderInsufficientPrivileges):
-                        continue
-                    except Exception:
-                        continue
-            except Exception:
-                # 其他不可預期錯誤：不中斷 app，換下一個候選
-                continue
-
-        # 全部失敗
-        return None
-
     def display_map(self, location, company=None):
         """
         安全地顯示公司位置地圖：
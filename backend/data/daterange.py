@@ -0,0 +1,90 @@
+# 資料分析
+import re
+
+import pandas as pd  # 資料處理
+
+from backend.data.pricestore import pricestore  # 本地日線價格庫
+
+
+# 時間範圍解析：所有時長與自訂日期都從同一份完整日線切片，不另外向上游下載
+class daterange:
+    # yfinance period 的格式：數字加上單位（d 為交易日數，其餘為日曆長度）
+    period_pattern = re.compile(r"(\d+)(d|wk|mo|y)")
+
+    @staticmethod
+    def period_start(period, index):
+        """依日線索引計算 period 的起始時間，"max" 回傳 None，無法辨識的 period 拋出 ValueError。"""
+        if period == "max":
+            return None
+        last = index[-1]
+        if period == "ytd":
+            return last.normalize().replace(month=1, day=1)
+        match = daterange.period_pattern.fullmatch(period or "")
+        if match is None:
+            raise ValueError(f"無法辨識的時長：{period}")
+        n, unit = int(match.group(1)), match.group(2)
+        if unit == "d":
+            # 與 yfinance 相同，"5d" 為最後 5 根K棒
+            return index[-min(max(n, 1), len(index))]
+        offset = {
+            "wk": pd.DateOffset(weeks=n),
+            "mo": pd.DateOffset(months=n),
+            "y": pd.DateOffset(years=n),
+        }[unit]
+        return last - offset
+
+    @staticmethod
+    def _as_index_time(value, index):
+        """將日期轉成與索引相同時區的 Timestamp，方便比較。"""
+        ts = pd.Timestamp(value)
+        if index.tz is not None and ts.tz is None:
+            ts = ts.tz_localize(index.tz)
+        return ts
+
+    @staticmethod
+    def slice_period(data, period):
+        """從完整日線切出指定 period。"""
+        if data is None or data.empty:
+            return data
+        start = daterange.period_start(period, data.index)
+        if start is None:
+            return data
+        return data[data.index >= start]
+
+    @staticmethod
+    def slice_range(data, start=None, end=None):
+        """從完整日線切出 [start, end) 區間，與 yf.download 的 start/end 語意相同。"""
+        if data is None or data.empty:
+            return data
+        mask = pd.Series(True, index=data.index)
+        if start is not None:
+            mask &= data.index >= daterange._as_index_time(start, data.index)
+        if end is not None:
+            mask &= data.index < daterange._as_index_time(end, data.index)
+        return data[mask.values]
+
+    @staticmethod
+    def history(symbol, period="max", start=None, end=None):
+        """取得單一代號的日線：有 start/end 時依日期切片，否則依 period 切片。"""
+        data = pricestore.history(symbol)
+        if start is not None or end is not None:
+            return daterange.slice_range(data, start, end)
+        return daterange.slice_period(data, period)
+
+    @staticmethod
+    def closes(symbols, period="max"):
+        """取得多個代號的收盤價並以日期對齊成一張表（欄為代號），缺少的代號以一次批次下載補齊。"""
+        histories = pricestore.history_many(symbols)
+        series = {}
+        for symbol in symbols:
+            data = histories.get(symbol)
+            if data is None or data.empty or "Close" not in data:
+                continue
+            # 價格庫的索引已統一為不含時區的交易日，可直接對齊
+            close = daterange.slice_period(data, period)["Close"]
+            series[symbol] = close[~close.index.duplicated(keep="last")]
+        if not series:
+            return pd.DataFrame()
+        prices = pd.DataFrame(series)
+        prices.index.name = "Date"
+        return prices
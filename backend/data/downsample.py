@@ -0,0 +1,88 @@
+# 資料分析
+import numpy as np  # 數值運算
+import pandas as pd  # 資料處理
+
+
+# 圖表降採樣：資料點超過圖寬時才合併，短區間（放大檢視）維持完整解析度
+class downsample:
+    # 每條線最多送到前端的點數，約等於一般寬版圖表的像素寬度
+    max_points = 1200
+
+    @staticmethod
+    def bucket_size(n, max_points=None):
+        """每個桶要合併幾根K棒，1 代表不需降採樣。"""
+        max_points = max_points or downsample.max_points
+        return max(1, -(-n // max_points))
+
+    @staticmethod
+    def ohlc(stock_data, max_points=None):
+        """K線以連續 k 根合併成一根：開盤取首、收盤取尾、高低取極值、成交量加總，索引為桶內第一天。"""
+        n = len(stock_data)
+        k = downsample.bucket_size(n, max_points)
+        if k == 1:
+            return stock_data
+        starts = np.arange(0, n, k)
+        ends = np.minimum(starts + k - 1, n - 1)
+        out = {}
+        if "Open" in stock_data:
+            out["Open"] = stock_data["Open"].to_numpy()[starts]
+        if "High" in stock_data:
+            out["High"] = np.maximum.reduceat(stock_data["High"].to_numpy(), starts)
+        if "Low" in stock_data:
+            out["Low"] = np.minimum.reduceat(stock_data["Low"].to_numpy(), starts)
+        if "Close" in stock_data:
+            out["Close"] = stock_data["Close"].to_numpy()[ends]
+        if "Volume" in stock_data:
+            out["Volume"] = np.add.reduceat(stock_data["Volume"].to_numpy(), starts)
+        return pd.DataFrame(out, index=stock_data.index[starts])
+
+    @staticmethod
+    def bucket_last(values, n, max_points=None):
+        """與 ohlc 相同分桶，取每桶最後一個值（用於柱狀指標，如 MACD 差異）。"""
+        k = downsample.bucket_size(n, max_points)
+        values = np.asarray(values)
+        if k == 1:
+            return values
+        return values[np.minimum(np.arange(0, n, k) + k - 1, n - 1)]
+
+    @staticmethod
+    def minmax_index(values, max_points=None):
+        """折線降採樣：每桶保留最小與最大值的位置（保住高低點），回傳排序後的位置陣列。"""
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        max_points = max_points or downsample.max_points
+        if n <= max_points:
+            return np.arange(n)
+        k = -(-n // max(1, max_points // 2))
+        buckets = -(-n // k)
+        padded = np.full(buckets * k, np.nan)
+        padded[:n] = values
+        shaped = padded.reshape(buckets, k)
+        valid = np.isfinite(shaped)
+        # 整桶都是 NaN 時 argmin/argmax 會取到第 0 個，保留 NaN 讓線條斷開
+        lo = np.argmin(np.where(valid, shaped, np.inf), axis=1)
+        hi = np.argmax(np.where(valid, shaped, -np.inf), axis=1)
+        offsets = np.arange(buckets) * k
+        idx = np.concatenate([offsets + lo, offsets + hi, [0, n - 1]])
+        return np.unique(idx[idx < n])
+
+    @staticmethod
+    def line(series, max_points=None):
+        """對單一 Series 做 min/max 降採樣。"""
+        if len(series) <= (max_points or downsample.max_points):
+            return series
+        return series.iloc[downsample.minmax_index(series.to_numpy(), max_points)]
+
+    @staticmethod
+    def frame(df, max_points=None):
+        """對 DataFrame 的每一欄取 min/max 位置的聯集後一起降採樣（各欄共用同一組日期）。"""
+        if len(df) <= (max_points or downsample.max_points):
+            return df
+        # 欄數多時每欄分到的點數要相應減少，總點數才不會膨脹
+        per_column = max(4, (max_points or downsample.max_points) // max(len(df.columns), 1))
+        idx = np.unique(
+            np.concatenate(
+                [downsample.minmax_index(df[col].to_numpy(), per_column) for col in df.columns]
+            )
+        )
+        return df.iloc[idx]
@@ -0,0 +1,90 @@
+# 資料分析
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np  # 數值運算
+
+from backend.cache import cache_dir, atomic_write, prune
+
+
+# 圖表建構共用工具：以 NumPy 陣列一次產生顏色與線段，並快取完成的圖表 JSON
+class figures:
+    # 行程內最多保留的圖表數
+    memory_size = 64
+    # 磁碟上最多保留的圖表數
+    disk_size = 512
+    _memory = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def sign_colors(values, positive="green", negative="red"):
+        """依數值正負產生顏色陣列（NaN 視為負）。"""
+        values = np.asarray(values, dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            return np.where(values >= 0, positive, negative)
+
+    @staticmethod
+    def updown_colors(open_, close, falling="green", rising="red"):
+        """依開盤減收盤的正負產生顏色陣列（與原本交易量配色相同：開盤 >= 收盤為 falling 色）。"""
+        diff = np.asarray(open_, dtype=np.float64) - np.asarray(close, dtype=np.float64)
+        return figures.sign_colors(diff, falling, rising)
+
+    @staticmethod
+    def segments(start, end, *columns):
+        """把多條兩點線段串成單一 trace 的座標：每段之間以 None 分隔。
+
+        start、end 為各段起訖座標；columns 為其他需要對齊的逐點欄位（如 y、文字），
+        每個欄位可給 (起點值, 終點值) 或單一陣列（起訖相同）。
+        """
+        def interleave(a, b):
+            a, b = np.asarray(a, dtype=object), np.asarray(b, dtype=object)
+            out = np.empty(len(a) * 3, dtype=object)
+            out[0::3], out[1::3], out[2::3] = a, b, None
+            return out
+
+        result = [interleave(start, end)]
+        for column in columns:
+            if isinstance(column, tuple):
+                result.append(interleave(*column))
+            else:
+                result.append(interleave(column, column))
+        return result
+
+    @staticmethod
+    def _key_hash(key):
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def cached(key, build):
+        """依 key 取得圖表 JSON（dict），沒有時呼叫 build() 產生 Figure 並保存。
+
+        key 應包含代號、資料區間、最後一根K棒與指標組合，資料變動時自然換成新 key。
+        """
+        digest = figures._key_hash(key)
+        with figures._lock:
+            text = figures._memory.get(digest)
+            if text is not None:
+                figures._memory.move_to_end(digest)
+        if text is not None:
+            return json.loads(text)
+
+        path = cache_dir("figures") / f"{digest}.json"
+        text = None
+        if path.exists():
+            try:
+                text = path.read_text(encoding="utf-8")
+            except Exception:
+                text = None
+        if text is None:
+            text = build().to_json()
+            atomic_write(path, lambda p: Path(p).write_text(text, encoding="utf-8"))
+            prune(path.parent, "*.json", figures.disk_size)
+
+        with figures._lock:
+            figures._memory[digest] = text
+            while len(figures._memory) > figures.memory_size:
+                figures._memory.popitem(last=False)
+        return json.loads(text)
@@ -0,0 +1,217 @@
+# 資料分析
+import concurrent.futures
+import operator
+import re
+import threading
+import time
+
+import numpy as np  # 數值運算
+import pandas as pd  # 資料處理
+
+# Streamlit 前端框架
+import streamlit as st  # Streamlit 模組
+
+from backend.cache import cache_dir, atomic_write
+from backend.data.cominfo import cominfo  # 公司基本資訊
+from backend.finrepot.ratios import ratios  # 財務比率
+
+
+# 基本面資料庫：所有代號的公司資訊與最新年報比率存成一張欄位型別固定的 Parquet 表，
+# 篩選時只在記憶體中的表上運算，不需任何網路請求
+class fundamentals:
+    # .info 欄位 -> 型別
+    info_columns = {
+        "shortName": "string",
+        "sector": "category",
+        "industry": "category",
+        "country": "category",
+        "financialCurrency": "category",
+        "fullTimeEmployees": "Int64",
+        "marketCap": "float64",
+        "enterpriseValue": "float64",
+        "totalRevenue": "float64",
+        "totalCash": "float64",
+        "totalDebt": "float64",
+        "freeCashflow": "float64",
+        "operatingCashflow": "float64",
+        "debtToEquity": "float64",
+        "grossMargins": "float64",
+        "operatingMargins": "float64",
+        "profitMargins": "float64",
+        "returnOnAssets": "float64",
+        "returnOnEquity": "float64",
+        "revenueGrowth": "float64",
+        "earningsGrowth": "float64",
+        "trailingPE": "float64",
+        "forwardPE": "float64",
+        "priceToBook": "float64",
+        "dividendYield": "float64",
+        "beta": "float64",
+        "currentPrice": "float64",
+    }
+    # 由年報計算的比率欄位加上此前綴
+    ratio_prefix = "annual_"
+    # 同時更新的代號數
+    max_workers = 8
+
+    _lock = threading.Lock()
+    # 行程內快取：(檔案修改時間, 資料表, {欄位: {值: 列位置}})
+    _table = None
+
+    @staticmethod
+    def path():
+        return cache_dir("fundamentals") / "warehouse.parquet"
+
+    @staticmethod
+    def columns():
+        """資料表所有欄位與型別。"""
+        columns = dict(fundamentals.info_columns)
+        columns.update({fundamentals.ratio_prefix + k: "float64" for k in ratios.names})
+        columns["updated"] = "datetime64[ns]"
+        return columns
+
+    @staticmethod
+    def _typed(table):
+        """補齊缺少的欄位並轉成固定型別。"""
+        table = table.reindex(columns=list(fundamentals.columns()))
+        for column, dtype in fundamentals.columns().items():
+            if dtype in ("float64", "Int64"):
+                table[column] = pd.to_numeric(table[column], errors="coerce").astype(dtype)
+            else:
+                table[column] = table[column].astype(dtype)
+        table.index = table.index.astype("string")
+        table.index.name = "symbol"
+        return table
+
+    @staticmethod
+    def load():
+        """讀取資料表（依檔案修改時間快取在記憶體），沒有資料時回傳空表。"""
+        path = fundamentals.path()
+        mtime = path.stat().st_mtime if path.exists() else None
+        cached = fundamentals._table
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        table = pd.read_parquet(path) if mtime else pd.DataFrame()
+        table = fundamentals._typed(table)
+        fundamentals._table = (mtime, table, {})
+        return table
+
+    @staticmethod
+    def groups(column):
+        """類別欄位（sector、industry 等）的索引：{值: 列位置陣列}。"""
+        table = fundamentals.load()
+        index = fundamentals._table[2]
+        if column not in index:
+            index[column] = {
+                key: np.asarray(rows)
+                for key, rows in table.groupby(column, observed=True).indices.items()
+            }
+        return index[column]
+
+    @staticmethod
+    def _info_row(symbol):
+        info = cominfo(symbol).com_info or {}
+        return {column: info.get(column) for column in fundamentals.info_columns}
+
+    @staticmethod
+    def update(symbols, include_statements=True):
+        """向上游取得代號的公司資訊（與年報比率）並寫入資料表，回傳成功更新的代號。"""
+        symbols = list(dict.fromkeys(symbols))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=fundamentals.max_workers) as executor:
+            rows = dict(zip(symbols, executor.map(fundamentals._info_row, symbols)))
+        rows = {s: r for s, r in rows.items() if any(v is not None for v in r.values())}
+        if not rows:
+            return []
+        new = pd.DataFrame.from_dict(rows, orient="index")
+
+        if include_statements:
+            statements = ratios.statements(list(rows))
+            if statements:
+                latest = ratios.latest(ratios.table(statements))
+                new = new.join(latest.add_prefix(fundamentals.ratio_prefix))
+        new["updated"] = pd.Timestamp(time.time(), unit="s")
+        new = fundamentals._typed(new)
+
+        with fundamentals._lock:
+            table = fundamentals.load()
+            # 類別欄位合併後重新轉型，新出現的類別一併納入
+            table = fundamentals._typed(pd.concat([table[~table.index.isin(new.index)], new]))
+            atomic_write(fundamentals.path(), lambda p: table.to_parquet(p))
+        return list(new.index)
+
+    # 條件運算子
+    _operators = {
+        "<": operator.lt,
+        "<=": operator.le,
+        ">": operator.gt,
+        ">=": operator.ge,
+        "==": operator.eq,
+        "!=": operator.ne,
+    }
+    _condition = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(.+?)\s*$")
+
+    @staticmethod
+    def parse_conditions(text):
+        """把每行一個的條件（如 "debtToEquity < 50"）轉為 [(欄位, 運算子, 值)]，無法辨識的行忽略。"""
+        conditions = []
+        for line in (text or "").splitlines():
+            match = fundamentals._condition.match(line)
+            if not match:
+                continue
+            column, op, value = match.groups()
+            try:
+                value = float(value)
+            except ValueError:
+                value = value.strip("'\"")
+            conditions.append((column, op, value))
+        return conditions
+
+    @staticmethod
+    def screen(conditions=(), sector=None, industry=None, sort=None, ascending=False, limit=None):
+        """以條件篩選資料表。
+
+        conditions 為 [(欄位, 運算子, 值)]，運算子為 < <= > >= == !=；
+        sector、industry 可給單一值或串列，透過類別索引直接取出對應的列。
+        缺值的列不符合任何數值條件。
+        """
+        table = fundamentals.load()
+        rows = None
+        for column, wanted in (("sector", sector), ("industry", industry)):
+            if not wanted:
+                continue
+            wanted = [wanted] if isinstance(wanted, str) else wanted
+            groups = fundamentals.groups(column)
+            selected = np.concatenate(
+                [groups.get(w, np.empty(0, dtype=np.intp)) for w in wanted]
+            )
+            rows = selected if rows is None else np.intersect1d(rows, selected)
+        result = table if rows is None else table.iloc[np.sort(rows)]
+
+        if len(result) and conditions:
+            mask = np.ones(len(result), dtype=bool)
+            for column, op, value in conditions:
+                if column not in result:
+                    raise KeyError(f"沒有欄位 {column}")
+                values = result[column]
+                matched = fundamentals._operators[op](values, value)
+                mask &= matched.fillna(False).to_numpy(dtype=bool)
+            result = result[mask]
+
+        if sort:
+            result = result.sort_values(sort, ascending=ascending)
+        if limit:
+            result = result.head(limit)
+        return result
+
+    @staticmethod
+    def plot(conditions_text, sector=None, industry=None, sort=None):
+        """繪製篩選結果。"""
+        try:
+            result = fundamentals.screen(
+                fundamentals.parse_conditions(conditions_text), sector, industry, sort
+            )
+        except (KeyError, TypeError) as e:
+            st.error(f"篩選條件錯誤：{e}")
+            return
+        st.subheader(f"篩選結果（{len(result)} 檔）")
+        st.dataframe(result, use_container_width=True)
@@ -0,0 +1,185 @@
+# 批次地理編碼：預先把整個代號清單的公司總部座標寫入地理編碼快取
+#
+# 用法：
+#   python -m backend.data.geobatch universe.txt
+#   python -m backend.data.geobatch universe.csv --nominatim-domain localhost:8080 --nominatim-scheme http --no-fallback
+#
+# 代號清單可為每行一個代號的文字檔，或含 symbol（或 ticker）欄位的 CSV。
+# 進度逐筆記錄在 <快取>/geobatch/<清單檔名>.jsonl，中斷後重新執行會從未完成的代號繼續。
+import argparse
+import concurrent.futures
+import json
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd  # 資料處理
+
+# 地理與地圖相關
+from geopy.geocoders import Nominatim  # 地理編碼
+from geopy.extra.rate_limiter import RateLimiter
+
+from backend.cache import cache_dir
+from backend.data import cominfo as company  # 公司資訊與地理編碼設定
+from backend.data.geocache import geocache  # 地理編碼快取
+
+
+class geobatch:
+    # 同時讀取公司資訊的執行緒數（地理編碼本身依各服務的 RateLimiter 限速）
+    info_workers = 8
+
+    @staticmethod
+    def read_universe(path):
+        """讀取代號清單（去除重複與空白，轉為大寫）。"""
+        path = Path(path)
+        if path.suffix.lower() == ".csv":
+            table = pd.read_csv(path)
+            column = next(
+                (c for c in table.columns if str(c).lower() in ("symbol", "ticker")),
+                table.columns[0],
+            )
+            symbols = table[column].astype(str)
+        else:
+            symbols = path.read_text(encoding="utf-8").split()
+        symbols = [s.strip().upper() for s in symbols]
+        return list(dict.fromkeys(s for s in symbols if s and not s.startswith("#")))
+
+    @staticmethod
+    def progress_path(universe):
+        return cache_dir("geobatch") / f"{Path(universe).stem}.jsonl"
+
+    @staticmethod
+    def load_progress(path):
+        """讀取已完成的代號紀錄 {代號: 紀錄}（後寫入的覆蓋先寫入的）。"""
+        done = {}
+        if Path(path).exists():
+            for line in Path(path).read_text(encoding="utf-8").splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 中斷時寫到一半的最後一行
+                    continue
+                done[record["symbol"]] = record
+        return done
+
+    @staticmethod
+    def providers(nominatim_domain=None, nominatim_scheme=None, fallback=True, min_delay=1.0):
+        """建立 [(服務名稱, 限速後的查詢函數)]；未指定 Nominatim 伺服器時使用 cominfo 的設定。
+
+        Nominatim 一律依 min_delay 另建限速器，不沿用 cominfo 固定 1 秒的限速器。
+        """
+        locator = Nominatim(
+            user_agent=company._USER_AGENT,
+            domain=nominatim_domain or company.NOMINATIM_DOMAIN,
+            scheme=nominatim_scheme or company.NOMINATIM_SCHEME,
+        )
+        nominatim = RateLimiter(
+            locator.geocode, min_delay_seconds=min_delay, max_retries=3,
+            error_wait_seconds=2.0, swallow_exceptions=False,
+        )
+        providers = [("nominatim", nominatim)]
+        if fallback:
+            providers += [("photon", company._PHOTON_GEOCODE), ("arcgis", company._ARCGIS_GEOCODE)]
+        return providers
+
+    @staticmethod
+    def geocode(query, providers, retry_missing=False):
+        """依序查詢各服務（先查快取），回傳 (服務名稱, (緯度, 經度), 是否有服務暫時失敗)。
+
+        查不到時服務名稱與座標為 None。查到或確定查無結果時寫入快取；暫時性錯誤不寫入，留待下次重試。
+        retry_missing 為 True 時忽略快取中「查無結果」的記錄，重新向服務查詢。
+        """
+        hit = geocache.best(query)
+        if hit:
+            return "cache", hit, False
+        failed = False
+        for name, geocode in providers:
+            cached = geocache.lookup(query, name)
+            if cached is geocache.MISSING or (cached is None and retry_missing):
+                try:
+                    loc = geocode(query)
+                except Exception:
+                    failed = True
+                    continue
+                cached = (loc.latitude, loc.longitude) if loc else None
+                geocache.put(query, name, cached)
+            if cached:
+                return name, cached, failed
+        return None, None, failed
+
+    @staticmethod
+    def _queries(symbol):
+        info = company.cominfo(symbol).com_info or {}
+        return company.cominfo._candidate_queries(
+            info.get("address1"), info.get("city"), info.get("country")
+        )
+
+    @staticmethod
+    def run(universe, providers, retry_missing=False, limit=None, log=print):
+        """對清單中尚未完成的代號取得地址並地理編碼，回傳各狀態的數量。"""
+        symbols = geobatch.read_universe(universe)
+        progress = geobatch.progress_path(universe)
+        done = geobatch.load_progress(progress)
+        # 上次因服務暫時失敗（error）的代號一定重試；查無結果的只在 retry_missing 時重試
+        todo = [
+            s for s in symbols
+            if s not in done
+            or done[s]["status"] == "error"
+            or (retry_missing and done[s]["status"] != "found")
+        ]
+        if limit:
+            todo = todo[:limit]
+        log(f"{len(symbols)} 檔，已完成 {len(symbols) - len(todo)} 檔，本次處理 {len(todo)} 檔")
+
+        counts = {"found": 0, "missing": 0, "error": 0, "no_address": 0}
+        started = time.time()
+        with open(progress, "a", encoding="utf-8") as out, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=geobatch.info_workers) as executor:
+            # 公司資訊平行讀取（經公司資訊快取），地理編碼依序送出以遵守各服務限速
+            for i, (symbol, queries) in enumerate(
+                zip(todo, executor.map(geobatch._queries, todo)), 1
+            ):
+                record = {"symbol": symbol, "status": "no_address"}
+                failed = False
+                for query in queries:
+                    source, location, query_failed = geobatch.geocode(query, providers, retry_missing)
+                    failed = failed or query_failed
+                    if location:
+                        record = {
+                            "symbol": symbol, "status": "found", "query": query,
+                            "source": source, "latitude": location[0], "longitude": location[1],
+                        }
+                        break
+                    # 有服務暫時失敗時不能確定查無結果，記為 error 讓下次續跑時重試
+                    record = {"symbol": symbol, "status": "error" if failed else "missing", "query": query}
+                counts[record["status"]] += 1
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                if i % 50 == 0 or i == len(todo):
+                    log(f"{i}/{len(todo)} {counts} {time.time() - started:.0f}s")
+        return counts
+
+    @staticmethod
+    def main(argv=None):
+        parser = argparse.ArgumentParser(
+            prog="python -m backend.data.geobatch",
+            description="預先把代號清單的公司總部座標寫入地理編碼快取",
+        )
+        parser.add_argument("universe", help="代號清單（每行一個代號，或含 symbol 欄位的 CSV）")
+        parser.add_argument("--nominatim-domain", help="Nominatim 伺服器（如 localhost:8080）")
+        parser.add_argument("--nominatim-scheme", help="Nominatim 連線方式（http 或 https）")
+        parser.add_argument("--min-delay", type=float, default=1.0, help="Nominatim 兩次請求最短間隔秒數")
+        parser.add_argument("--no-fallback", action="store_true", help="只使用 Nominatim")
+        parser.add_argument("--retry-missing", action="store_true", help="重新查詢先前查無結果的代號（忽略快取中的查無結果記錄）")
+        parser.add_argument("--limit", type=int, help="本次最多處理的代號數")
+        args = parser.parse_args(argv)
+
+        providers = geobatch.providers(
+            args.nominatim_domain, args.nominatim_scheme, not args.no_fallback, args.min_delay
+        )
+        geobatch.run(args.universe, providers, args.retry_missing, args.limit)
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(geobatch.main())
@@ -0,0 +1,96 @@
+# 資料處理
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from backend.cache import cache_dir
+
+
+# 地理編碼快取：以 (正規化後的查詢, 服務) 為鍵存在本地 SQLite，多個行程共用。
+# 公司地址幾乎不會變動，查到的座標永久保存；查無結果也會記錄，negative_ttl 後才重查
+class geocache:
+    # 查無結果的記錄有效秒數
+    negative_ttl = 7 * 24 * 60 * 60
+    # lookup 沒有記錄時的回傳值（與「查無結果」的 None 區分）
+    MISSING = object()
+
+    _lock = threading.Lock()
+    _ready = False
+
+    @staticmethod
+    def path():
+        return cache_dir("geocode") / "geocode.sqlite3"
+
+    @staticmethod
+    def _connect():
+        conn = sqlite3.connect(geocache.path(), timeout=30)
+        if not geocache._ready:
+            with geocache._lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS geocode ("
+                    " query TEXT NOT NULL, provider TEXT NOT NULL,"
+                    " latitude REAL, longitude REAL, updated REAL NOT NULL,"
+                    " PRIMARY KEY (query, provider))"
+                )
+                conn.commit()
+                geocache._ready = True
+        return conn
+
+    @staticmethod
+    def normalize(query):
+        """統一大小寫、空白與逗號格式，讓同一地址的不同寫法共用記錄。"""
+        query = re.sub(r"\s+", " ", (query or "").lower())
+        query = re.sub(r"\s*,\s*", ", ", query)
+        return query.strip(" ,.")
+
+    @staticmethod
+    def lookup(query, provider):
+        """查詢單一服務的記錄：有座標回傳 (緯度, 經度)，查無結果（未過期）回傳 None，沒有記錄回傳 MISSING。"""
+        with closing(geocache._connect()) as conn:
+            row = conn.execute(
+                "SELECT latitude, longitude, updated FROM geocode WHERE query = ? AND provider = ?",
+                (geocache.normalize(query), provider),
+            ).fetchone()
+        if row is None:
+            return geocache.MISSING
+        latitude, longitude, updated = row
+        if latitude is None:
+            if time.time() - updated > geocache.negative_ttl:
+                return geocache.MISSING
+            return None
+        return (latitude, longitude)
+
+    @staticmethod
+    def best(query):
+        """任何服務（含手動登錄）查到的座標，沒有則回傳 None。"""
+        with closing(geocache._connect()) as conn:
+            row = conn.execute(
+                "SELECT latitude, longitude FROM geocode WHERE query = ? AND latitude IS NOT NULL"
+                " ORDER BY provider = 'hardcoded' DESC, updated DESC LIMIT 1",
+                (geocache.normalize(query),),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    @staticmethod
+    def put(query, provider, location):
+        """寫入記錄；location 為 (緯度, 經度) 或 None（查無結果）。"""
+        latitude, longitude = location if location else (None, None)
+        with closing(geocache._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)",
+                (geocache.normalize(query), provider, latitude, longitude, time.time()),
+            )
+
+    @staticmethod
+    def put_many(rows, provider):
+        """批次寫入 {查詢: (緯度, 經度) 或 None}。"""
+        now = time.time()
+        values = [
+            (geocache.normalize(q), provider, *(loc if loc else (None, None)), now)
+            for q, loc in rows.items()
+        ]
+        with closing(geocache._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)", values)
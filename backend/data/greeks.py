@@ -0,0 +1,152 @@
+# 資料分析
+import numpy as np  # 數值運算
+import pandas as pd  # 資料處理
+
+from backend.data.pricestore import pricestore  # 本地日線價格庫
+
+
+# Black-Scholes 定價、希臘字母與隱含波動率：所有合約以陣列一次計算，沒有逐筆迴圈
+class blackscholes:
+    # 取不到無風險利率時的預設年利率
+    rate = 0.04
+    # 隱含波動率求解範圍與精度
+    vol_low = 1e-4
+    vol_high = 5.0
+    tolerance = 1e-6
+    max_iterations = 50
+    # 剩餘天數下限（當日到期的合約以此計算，避免除以零）
+    min_days = 0.25
+
+    @staticmethod
+    def norm_pdf(x):
+        return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+    @staticmethod
+    def norm_cdf(x):
+        """標準常態累積分布（Abramowitz-Stegun 7.1.26 erf 近似，誤差約 1e-7）。"""
+        z = np.abs(x) / np.sqrt(2)
+        t = 1 / (1 + 0.3275911 * z)
+        poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+        erf = 1 - poly * np.exp(-z * z)
+        return 0.5 * (1 + np.sign(x) * erf)
+
+    @staticmethod
+    def _d1_d2(S, K, T, r, sigma, q):
+        vol_t = sigma * np.sqrt(T)
+        d1 = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / vol_t
+        return d1, d1 - vol_t
+
+    @staticmethod
+    def price(S, K, T, r, sigma, is_call, q=0.0):
+        """歐式期權理論價格，is_call 為布林陣列。"""
+        d1, d2 = blackscholes._d1_d2(S, K, T, r, sigma, q)
+        sign = np.where(is_call, 1.0, -1.0)
+        cdf = blackscholes.norm_cdf
+        return sign * (S * np.exp(-q * T) * cdf(sign * d1) - K * np.exp(-r * T) * cdf(sign * d2))
+
+    @staticmethod
+    def greeks(S, K, T, r, sigma, is_call, q=0.0):
+        """回傳 {delta, gamma, theta(每日), vega(波動率每 1%), rho(利率每 1%)}。"""
+        d1, d2 = blackscholes._d1_d2(S, K, T, r, sigma, q)
+        sign = np.where(is_call, 1.0, -1.0)
+        cdf, pdf = blackscholes.norm_cdf, blackscholes.norm_pdf(d1)
+        carry, discount = np.exp(-q * T), np.exp(-r * T)
+        sqrt_t = np.sqrt(T)
+        theta = (
+            -S * carry * pdf * sigma / (2 * sqrt_t)
+            - sign * r * K * discount * cdf(sign * d2)
+            + sign * q * S * carry * cdf(sign * d1)
+        )
+        return {
+            "delta": sign * carry * cdf(sign * d1),
+            "gamma": carry * pdf / (S * sigma * sqrt_t),
+            "theta": theta / 365,
+            "vega": S * carry * pdf * sqrt_t / 100,
+            "rho": sign * K * T * discount * cdf(sign * d2) / 100,
+        }
+
+    @staticmethod
+    def implied_vol(price, S, K, T, r, is_call, q=0.0):
+        """以牛頓法求隱含波動率，步驟跳出區間時改用二分法（整批合約同時疊代）。
+
+        價格不在無套利範圍內（低於內含價值或高於上限）的合約回傳 NaN。
+        """
+        price, S, K, T = (np.asarray(a, dtype=np.float64) for a in np.broadcast_arrays(price, S, K, T))
+        is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), price.shape)
+        carry, discount = np.exp(-q * T) * S, np.exp(-r * T) * K
+        lower = np.where(is_call, np.maximum(carry - discount, 0), np.maximum(discount - carry, 0))
+        upper = np.where(is_call, carry, discount)
+        valid = np.isfinite(price) & (price > lower) & (price < upper) & (T > 0) & (K > 0)
+
+        low = np.full(price.shape, blackscholes.vol_low)
+        high = np.full(price.shape, blackscholes.vol_high)
+        # Brenner-Subrahmanyam 近似作為起點
+        sigma = np.clip(np.sqrt(2 * np.pi / np.where(T > 0, T, 1)) * price / S, 0.05, 2.0)
+        active = valid.copy()
+        for _ in range(blackscholes.max_iterations):
+            if not active.any():
+                break
+            s, k, t, p, c, v = (a[active] for a in (S, K, T, price, is_call, sigma))
+            diff = blackscholes.price(s, k, t, r, v, c, q) - p
+            d1, _ = blackscholes._d1_d2(s, k, t, r, v, q)
+            vega = s * np.exp(-q * t) * blackscholes.norm_pdf(d1) * np.sqrt(t)
+            lo, hi = low[active], high[active]
+            # 理論價隨波動率遞增：價格過高代表波動率上限可收緊，反之收緊下限
+            hi = np.where(diff > 0, v, hi)
+            lo = np.where(diff > 0, lo, v)
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                step = v - diff / vega
+            bisect = ~np.isfinite(step) | (step <= lo) | (step >= hi)
+            done = (np.abs(diff) < blackscholes.tolerance) | (hi - lo < blackscholes.tolerance)
+            # 已收斂的保留目前的波動率
+            new = np.where(done, v, np.where(bisect, 0.5 * (lo + hi), step))
+            low[active], high[active], sigma[active] = lo, hi, new
+            index = np.flatnonzero(active)
+            active[index[done]] = False
+        return np.where(valid, sigma, np.nan)
+
+    @staticmethod
+    def risk_free_rate():
+        """以 13 週美國國庫券殖利率（^IRX）作為無風險利率，取不到時使用預設值。"""
+        try:
+            close = pricestore.history("^IRX")["Close"].dropna()
+            if not close.empty:
+                return float(close.iloc[-1]) / 100
+        except Exception:
+            pass
+        return blackscholes.rate
+
+    @staticmethod
+    def market_price(df):
+        """期權市價：買賣價都有效時取中價，否則使用最後成交價。"""
+        bid = pd.to_numeric(df.get("bid"), errors="coerce") if "bid" in df else None
+        ask = pd.to_numeric(df.get("ask"), errors="coerce") if "ask" in df else None
+        last = pd.to_numeric(df["lastPrice"], errors="coerce").to_numpy(dtype=np.float64)
+        if bid is None or ask is None:
+            return last
+        bid, ask = bid.to_numpy(dtype=np.float64), ask.to_numpy(dtype=np.float64)
+        quoted = (bid > 0) & (ask >= bid)
+        return np.where(quoted, 0.5 * (bid + ask), last)
+
+    @staticmethod
+    def chain(df, spot, rate=None, q=0.0):
+        """為期權表（需含 type、dte、strike 與價格欄）加上重算的隱含波動率與希臘字母欄。
+
+        重算不出隱含波動率的合約改用 yfinance 提供的 impliedVolatility 計算希臘字母。
+        """
+        rate = blackscholes.risk_free_rate() if rate is None else rate
+        df = df.copy()
+        strike = df["strike"].to_numpy(dtype=np.float64)
+        years = np.maximum(df["dte"].to_numpy(dtype=np.float64), blackscholes.min_days) / 365
+        is_call = (df["type"] == "call").to_numpy()
+        iv = blackscholes.implied_vol(blackscholes.market_price(df), spot, strike, years, rate, is_call, q)
+        if "impliedVolatility" in df:
+            quoted = df["impliedVolatility"].to_numpy(dtype=np.float64)
+            sigma = np.where(np.isfinite(iv), iv, np.where(quoted > 0, quoted, np.nan))
+        else:
+            sigma = iv
+        df["iv"] = iv
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for name, values in blackscholes.greeks(spot, strike, years, rate, sigma, is_call, q).items():
+                df[name] = values
+        return df
@@ -0,0 +1,508 @@
+# 資料分析
+import json
+import threading
+from collections import OrderedDict
+import numpy as np  # 數值運算
+import pandas as pd  # 資料處理
+from functools import lru_cache
+
+from backend.cache import cache_path, atomic_write
+from backend.data.pricestore import pricestore  # 本地日線價格庫
+
+
+# 技術指標：一次計算全部指標，輸入可為單一代號 (N,) 或多個代號並排的 (N, 代號數) 陣列
+class indicators:
+    # 預設參數（與原本 ta 套件的設定一致）
+    sma_windows = (5, 20, 60)
+    rsi_window = 14
+    macd_fast, macd_slow, macd_sign = 12, 26, 9
+    bb_window, bb_dev = 20, 2
+    atr_window = 14
+    stoch_window, stoch_smooth = 14, 3
+
+    @staticmethod
+    def _as_array(values):
+        """轉成連續的 float64 陣列。"""
+        return np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+
+    @staticmethod
+    def _prefix(values):
+        """累加和（前面補一列 0）；有 NaN 時另外回傳有效筆數的累加和。"""
+        zeros = np.zeros((1,) + values.shape[1:])
+        valid = np.isfinite(values)
+        if valid.all():
+            return np.concatenate([zeros, np.cumsum(values, axis=0)]), None
+        csum = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+        ccount = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+        return csum, ccount
+
+    @staticmethod
+    def _window_sum(prefix, window):
+        """由累加和取出滾動加總，視窗內有 NaN 時結果為 NaN（同 pandas rolling）。"""
+        csum, ccount = prefix
+        out = np.full((len(csum) - 1,) + csum.shape[1:], np.nan)
+        if len(csum) > window:
+            total = csum[window:] - csum[:-window]
+            if ccount is not None:
+                count = ccount[window:] - ccount[:-window]
+                total = np.where(count == window, total, np.nan)
+            out[window - 1:] = total
+        return out
+
+    @staticmethod
+    def _rolling_sum(values, window):
+        return indicators._window_sum(indicators._prefix(values), window)
+
+    @staticmethod
+    def sma(values, window, prefix=None):
+        """簡單移動平均；prefix 可傳入已算好的累加和，多個視窗共用一次累加。"""
+        if prefix is None:
+            prefix = indicators._prefix(indicators._as_array(values))
+        return indicators._window_sum(prefix, window) / window
+
+    @staticmethod
+    def rolling_std(values, window):
+        """滾動母體標準差（ddof=0），先扣除各欄平均以降低累加誤差。"""
+        values = indicators._as_array(values)
+        if np.isfinite(values).any():
+            values = values - np.nanmean(values, axis=0)
+        mean = indicators._rolling_sum(values, window) / window
+        mean_sq = indicators._rolling_sum(values * values, window) / window
+        return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+    @staticmethod
+    def _rolling_extreme(values, window, func):
+        """滾動最大/最小值（van Herk/Gil-Werman）：分塊做前綴與後綴累積，與視窗長度無關。"""
+        n = len(values)
+        out = np.full(values.shape, np.nan)
+        if n < window:
+            return out
+        # NaN 需傳遞到包含它的每個視窗，先記下位置再以 0 暫代
+        invalid = ~np.isfinite(values)
+        has_nan = invalid.any()
+        blocks = -(-n // window)
+        padded = np.empty((blocks * window,) + values.shape[1:])
+        padded[:n] = np.where(invalid, 0.0, values) if has_nan else values
+        padded[n:] = padded[n - 1]
+        shaped = padded.reshape((blocks, window) + values.shape[1:])
+        forward = func.accumulate(shaped, axis=1).reshape(padded.shape)
+        backward = func.accumulate(shaped[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+        out[window - 1:] = func(backward[: n - window + 1], forward[window - 1:n])
+        if has_nan:
+            out[indicators._rolling_sum(invalid.astype(np.float64), window) > 0] = np.nan
+        return out
+
+    # 分塊遞迴濾波的區塊長度
+    _block = 64
+
+    @staticmethod
+    def _ffill(values):
+        """沿時間軸向前填補 NaN（開頭的 NaN 以第一筆有效值填補），回傳 (填補後陣列, 第一筆有效位置)。"""
+        valid = np.isfinite(values)
+        first = np.argmax(valid, axis=0)
+        if valid.all():
+            return values, first
+        rows = np.arange(len(values)).reshape((-1,) + (1,) * (values.ndim - 1))
+        last = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+        last = np.where(last < 0, first, last)
+        return np.take_along_axis(values, last, axis=0), first
+
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _decay_matrix(decay, size, scale=1.0):
+        """下三角衰減矩陣 M[j, i] = scale * decay**(j - i)（i <= j），同參數重複使用。"""
+        with np.errstate(under="ignore"):
+            powers = scale * decay ** np.arange(size)
+        lag = np.arange(size)[:, None] - np.arange(size)[None, :]
+        matrix = np.where(lag >= 0, powers[np.maximum(lag, 0)], 0.0)
+        matrix.setflags(write=False)
+        return matrix
+
+    @staticmethod
+    def ema(values, span=None, alpha=None, min_periods=None, init=None, seen=0):
+        """指數移動平均（adjust=False，與 pandas ewm 相同的起點與 min_periods 規則）。
+
+        遞迴 y[t] = (1 - alpha) * y[t-1] + alpha * x[t] 以分塊矩陣乘法展開：
+        先算各區塊內的局部結果，再以第二個衰減矩陣一次推出各區塊的起始值，全程沒有逐列迴圈。
+        中間的 NaN 以前一筆有效值代入。
+        接續計算時以 init 傳入前一根的 EMA、seen 傳入已累積的有效筆數。
+        """
+        values = indicators._as_array(values)
+        if alpha is None:
+            alpha = 2.0 / (span + 1.0)
+            if min_periods is None:
+                min_periods = span
+        shape = values.shape
+        n = shape[0]
+        if n == 0:
+            return values.copy()
+        x, first = indicators._ffill(values.reshape(n, -1))
+        width = x.shape[1]
+        decay = 1.0 - alpha
+
+        size = min(indicators._block, n)
+        blocks = -(-n // size)
+        padded = np.empty((blocks * size, width))
+        padded[:n] = x
+        padded[n:] = x[-1]
+        # (區塊 × 欄, 區塊內位置) 一次矩陣乘法
+        chunks = padded.reshape(blocks, size, width).transpose(0, 2, 1).reshape(-1, size)
+        local = chunks @ indicators._decay_matrix(decay, size, alpha).T
+        local = local.reshape(blocks, width, size)
+
+        # 各區塊結尾值：end[b] = local_end[b] + decay**size * end[b-1]
+        # 起點 end[-1] 為 init，沒有時取第一筆資料（使第一筆輸出等於自己）
+        if init is None:
+            start = x[:1]
+        else:
+            start = np.broadcast_to(np.asarray(init, dtype=np.float64).reshape(1, -1), (1, width))
+        with np.errstate(under="ignore"):
+            carry = decay ** size
+            ends = indicators._decay_matrix(carry, blocks) @ local[:, :, -1]
+            ends += carry ** np.arange(1, blocks + 1)[:, None] * start
+        starts = np.concatenate([start, ends[:-1]])
+        with np.errstate(under="ignore"):
+            powers = decay ** np.arange(1, size + 1)
+        out = local + starts[:, :, None] * powers
+        out = out.transpose(0, 2, 1).reshape(blocks * size, width)[:n]
+
+        # 第一筆有效值之前、以及有效筆數不足 min_periods 的位置設為 NaN
+        rows = np.arange(n)[:, None]
+        if init is None:
+            out[rows < first + max((min_periods or 0) - 1, 0)] = np.nan
+        else:
+            out[rows < max((min_periods or 0) - 1 - seen, 0)] = np.nan
+        return out.reshape(shape)
+
+    @staticmethod
+    def wilder_averages(close, window=14, prev_close=None, init=None, seen=0):
+        """RSI 使用的 Wilder 平均漲幅與平均跌幅；接續計算時傳入前收盤、前一根的 (漲, 跌) 與已累積筆數。"""
+        close = indicators._as_array(close)
+        diff = np.zeros(close.shape)
+        diff[1:] = close[1:] - close[:-1]
+        if prev_close is not None and len(close):
+            diff[0] = close[0] - prev_close
+        valid = np.isfinite(close)
+        if not valid.all():
+            # 上市前（或缺值）的K棒沒有漲跌，不可當成 0 帶入平均
+            diff = np.where(valid, diff, np.nan)
+            # 每欄第一筆有效K棒沒有前收盤，漲跌視為 0（同 ta）
+            prev_valid = np.zeros(close.shape, dtype=bool)
+            prev_valid[1:] = valid[:-1]
+            prev_valid[0] = prev_close is not None and np.isfinite(prev_close)
+            diff = np.where(valid & ~prev_valid, 0.0, diff)
+        up = np.maximum(diff, 0.0)
+        down = np.maximum(-diff, 0.0)
+        init_up, init_down = (None, None) if init is None else init
+        avg_up = indicators.ema(up, alpha=1.0 / window, min_periods=window, init=init_up, seen=seen)
+        avg_down = indicators.ema(down, alpha=1.0 / window, min_periods=window, init=init_down, seen=seen)
+        return avg_up, avg_down
+
+    @staticmethod
+    def rsi_from_averages(avg_up, avg_down):
+        """由平均漲跌幅換算 RSI。"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = avg_up / avg_down
+            out = np.where(avg_down == 0, 100.0, 100.0 - 100.0 / (1.0 + rs))
+        return np.where(np.isfinite(avg_down), out, np.nan)
+
+    @staticmethod
+    def rsi(close, window=14):
+        """Wilder RSI。"""
+        return indicators.rsi_from_averages(*indicators.wilder_averages(close, window))
+
+    @staticmethod
+    def macd(close, fast=12, slow=26, sign=9):
+        """MACD 線、信號線與柱狀差異。"""
+        close = indicators._as_array(close)
+        line = indicators.ema(close, span=fast) - indicators.ema(close, span=slow)
+        signal = indicators.ema(line, span=sign)
+        return line, signal, line - signal
+
+    @staticmethod
+    def bollinger(close, window=20, dev=2):
+        """布林通道：中軌、上軌、下軌。"""
+        mid = indicators.sma(close, window)
+        std = indicators.rolling_std(close, window)
+        return mid, mid + dev * std, mid - dev * std
+
+    @staticmethod
+    def true_range(high, low, close, prev_close=None):
+        """真實波幅，第一根K棒沒有前收盤時取高低差。"""
+        high, low, close = (indicators._as_array(v) for v in (high, low, close))
+        prev = np.full(close.shape, np.nan)
+        prev[1:] = close[:-1]
+        if prev_close is not None and len(close):
+            prev[0] = prev_close
+        tr = high - low
+        with np.errstate(invalid="ignore"):
+            tr = np.fmax(tr, np.abs(high - prev))
+            tr = np.fmax(tr, np.abs(low - prev))
+        return tr
+
+    @staticmethod
+    def atr(high, low, close, window=14, prev_close=None, init=None):
+        """平均真實波幅：以前 window 根的平均為起點再做 Wilder 平滑；接續計算時傳入前收盤與前一根 ATR。"""
+        if init is not None:
+            tr = indicators.true_range(high, low, close, prev_close)
+            return indicators.ema(tr, alpha=1.0 / window, min_periods=1, init=init)
+        tr = indicators.true_range(high, low, close)
+        # 各欄上市日不同，起點取各自第一筆有效資料之後第 window 根
+        first = np.argmax(np.isfinite(tr), axis=0)
+        seed_row = first + window - 1
+        rows = np.arange(len(tr)).reshape((-1,) + (1,) * (tr.ndim - 1))
+        seed = indicators._rolling_sum(tr, window) / window
+        seeded = np.where(rows < seed_row, np.nan, np.where(rows == seed_row, seed, tr))
+        return indicators.ema(seeded, alpha=1.0 / window, min_periods=1)
+
+    @staticmethod
+    def stochastic(high, low, close, window=14, smooth=3):
+        """隨機震盪指標 %K 與 %D。"""
+        high, low, close = (indicators._as_array(v) for v in (high, low, close))
+        lowest = indicators._rolling_extreme(low, window, np.minimum)
+        highest = indicators._rolling_extreme(high, window, np.maximum)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            k = 100.0 * (close - lowest) / (highest - lowest)
+        return k, indicators.sma(k, smooth)
+
+    @staticmethod
+    def compute_arrays(high, low, close):
+        """一次算出所有指標，回傳 {名稱: 陣列}，形狀與輸入相同。"""
+        high, low, close = (indicators._as_array(v) for v in (high, low, close))
+        out = {}
+        # 各均線與布林中軌共用同一次累加和
+        prefix = indicators._prefix(close)
+        for window in indicators.sma_windows:
+            out[f"sma{window}"] = indicators.sma(close, window, prefix)
+        out["rsi"] = indicators.rsi(close, indicators.rsi_window)
+        out["macd"], out["macd_signal"], out["macd_hist"] = indicators.macd(
+            close, indicators.macd_fast, indicators.macd_slow, indicators.macd_sign
+        )
+        mid = indicators.sma(close, indicators.bb_window, prefix)
+        std = indicators.rolling_std(close, indicators.bb_window)
+        out["bb_mid"] = mid
+        out["bb_upper"] = mid + indicators.bb_dev * std
+        out["bb_lower"] = mid - indicators.bb_dev * std
+        out["atr"] = indicators.atr(high, low, close, indicators.atr_window)
+        out["stoch_k"], out["stoch_d"] = indicators.stochastic(
+            high, low, close, indicators.stoch_window, indicators.stoch_smooth
+        )
+        return out
+
+    @staticmethod
+    def compute(stock_data):
+        """計算單一代號的全部指標，回傳與 stock_data 同索引的 DataFrame。"""
+        arrays = indicators.compute_arrays(
+            stock_data["High"], stock_data["Low"], stock_data["Close"]
+        )
+        # 先併成一個二維陣列，避免 DataFrame 逐欄複製
+        return pd.DataFrame(
+            np.column_stack(list(arrays.values())),
+            index=stock_data.index,
+            columns=list(arrays),
+        )
+
+
+# 串流指標：只保存各遞迴狀態與滾動視窗尾端，新增 N 根K棒只需 O(N) 計算
+class indicatorstream:
+    # K棒少於此數時直接全量計算，確保各遞迴狀態都已有效
+    min_bars = 2 * max(indicators.sma_windows)
+    # 滾動視窗需要保留的尾端長度
+    tail_size = max(max(indicators.sma_windows), indicators.bb_window, indicators.stoch_window)
+    # 記憶體中保留完整指標的代號數（圖表需要整段指標，磁碟上只保存狀態）
+    memory_size = 64
+    _frames = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def path(symbol):
+        return cache_path("indicators", symbol, ".json")
+
+    @staticmethod
+    def load(symbol):
+        """讀取已保存的遞迴狀態與滾動視窗尾端，沒有或損毀時回傳 None。"""
+        try:
+            with open(indicatorstream.path(symbol), "r", encoding="utf-8") as infile:
+                return json.load(infile)
+        except Exception:
+            return None
+
+    @staticmethod
+    def save(symbol, state):
+        def write_state(p):
+            with open(p, "w", encoding="utf-8") as outfile:
+                json.dump(state, outfile)
+
+        atomic_write(indicatorstream.path(symbol), write_state)
+
+    @staticmethod
+    def step(state, bars):
+        """從 state 接續計算 bars 的指標，回傳 (指標 DataFrame, 新狀態)。
+
+        state 為 None 時從頭計算。新狀態停在 bars 的倒數第二根：最後一根可能是盤中尚未收完的K棒，
+        下次更新時會連同它一起重算。
+        """
+        I = indicators
+        high, low, close = (I._as_array(bars[col]) for col in ("High", "Low", "Close"))
+        n = len(close)
+        if state is None:
+            tails = {"High": [], "Low": [], "Close": [], "stoch_k": []}
+            prev_close, seen = None, 0
+        else:
+            tails = state["tails"]
+            prev_close, seen = tails["Close"][-1], state["bars"]
+
+        # 滾動視窗：在保存的尾端之後接上新K棒計算，只取新K棒的部分
+        c_all = np.concatenate([tails["Close"], close])
+        h_all = np.concatenate([tails["High"], high])
+        l_all = np.concatenate([tails["Low"], low])
+        cut = len(c_all) - n
+        out = {}
+        prefix = I._prefix(c_all)
+        for window in I.sma_windows:
+            out[f"sma{window}"] = I.sma(c_all, window, prefix)[cut:]
+
+        # 遞迴指標：以保存的狀態為起點
+        if state is None:
+            fast = I.ema(close, span=I.macd_fast)
+            slow = I.ema(close, span=I.macd_slow)
+            line = fast - slow
+            signal = I.ema(line, span=I.macd_sign)
+            avg_up, avg_down = I.wilder_averages(close, I.rsi_window)
+            atr = I.atr(high, low, close, I.atr_window)
+        else:
+            fast = I.ema(close, span=I.macd_fast, init=state["ema_fast"], seen=seen)
+            slow = I.ema(close, span=I.macd_slow, init=state["ema_slow"], seen=seen)
+            line = fast - slow
+            signal = I.ema(
+                line,
+                span=I.macd_sign,
+                init=state["macd_signal"],
+                seen=max(seen - I.macd_slow + 1, 0),
+            )
+            avg_up, avg_down = I.wilder_averages(
+                close,
+                I.rsi_window,
+                prev_close=prev_close,
+                init=(state["avg_up"], state["avg_down"]),
+                seen=seen,
+            )
+            atr = I.atr(high, low, close, I.atr_window, prev_close=prev_close, init=state["atr"])
+        out["rsi"] = I.rsi_from_averages(avg_up, avg_down)
+        out["macd"], out["macd_signal"], out["macd_hist"] = line, signal, line - signal
+
+        mid = I.sma(c_all, I.bb_window, prefix)[cut:]
+        std = I.rolling_std(c_all, I.bb_window)[cut:]
+        out["bb_mid"] = mid
+        out["bb_upper"] = mid + I.bb_dev * std
+        out["bb_lower"] = mid - I.bb_dev * std
+        out["atr"] = atr
+
+        lowest = I._rolling_extreme(l_all, I.stoch_window, np.minimum)[cut:]
+        highest = I._rolling_extreme(h_all, I.stoch_window, np.maximum)[cut:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            k = 100.0 * (close - lowest) / (highest - lowest)
+        k_all = np.concatenate([tails["stoch_k"], k])
+        out["stoch_k"] = k
+        out["stoch_d"] = I.sma(k_all, I.stoch_smooth)[len(k_all) - n:]
+
+        frame = pd.DataFrame(
+            np.column_stack(list(out.values())), index=bars.index, columns=list(out)
+        )
+
+        # 新狀態停在倒數第二根；只有一根新K棒時維持原狀態
+        if n < 2:
+            return frame, state
+        p = n - 2
+        keep = indicatorstream.tail_size
+        new_state = {
+            "as_of": bars.index[p].isoformat(),
+            "close": float(close[p]),
+            "bars": seen + p + 1,
+            "ema_fast": float(fast[p]),
+            "ema_slow": float(slow[p]),
+            "macd_signal": float(signal[p]),
+            "avg_up": float(avg_up[p]),
+            "avg_down": float(avg_down[p]),
+            "atr": float(atr[p]),
+            "tails": {
+                "Close": c_all[: cut + p + 1][-keep:].tolist(),
+                "High": h_all[: cut + p + 1][-keep:].tolist(),
+                "Low": l_all[: cut + p + 1][-keep:].tolist(),
+                "stoch_k": k_all[: len(k_all) - n + p + 1][-(I.stoch_smooth - 1):].tolist(),
+            },
+        }
+        return frame, new_state
+
+    @staticmethod
+    def _resume_position(history, state):
+        """找出 state 對應的K棒位置；歷史被改寫（如除權息重抓）或狀態不完整時回傳 None。"""
+        if state is None:
+            return None
+        values = [state.get(key) for key in ("ema_fast", "ema_slow", "macd_signal", "avg_up", "avg_down", "atr")]
+        if any(v is None or not np.isfinite(v) for v in values):
+            return None
+        # 日線索引已排序，二分搜尋不需為整段索引建立雜湊表
+        as_of = pd.Timestamp(state["as_of"])
+        pos = int(history.index.searchsorted(as_of))
+        if pos + 1 >= len(history) or history.index[pos] != as_of:
+            return None
+        if not np.isclose(history["Close"].iloc[pos], state["close"], rtol=1e-9, atol=0.0):
+            return None
+        return pos
+
+    @staticmethod
+    def update(symbol, history):
+        """從保存的狀態接續計算，只回傳狀態之後的K棒指標；沒有可接續的狀態時回傳 None。
+
+        磁碟上只有遞迴狀態與滾動視窗尾端，計算量只與新K棒數有關，不隨歷史長度增加。
+        """
+        state = indicatorstream.load(symbol)
+        pos = indicatorstream._resume_position(history, state)
+        if pos is None:
+            return None
+        rows, new_state = indicatorstream.step(state, history.iloc[pos + 1:])
+        if new_state is not state:
+            indicatorstream.save(symbol, new_state)
+        return rows
+
+    @staticmethod
+    def frame(symbol, history):
+        """與 history 同索引的完整指標：記憶體中已有狀態之前的指標時只接續新K棒，否則全量計算並保存狀態。"""
+        if len(history) < indicatorstream.min_bars:
+            # 資料太短，不保存狀態
+            return indicators.compute(history)
+        with indicatorstream._lock:
+            cached = indicatorstream._frames.get(symbol)
+        state = indicatorstream.load(symbol)
+        pos = indicatorstream._resume_position(history, state)
+        if cached is not None and pos is not None and len(cached) == pos + 1 \
+                and cached.index[-1] == history.index[pos]:
+            rows, new_state = indicatorstream.step(state, history.iloc[pos + 1:])
+            frame = pd.concat([cached, rows])
+        else:
+            frame, new_state = indicatorstream.step(None, history)
+        if new_state is not state:
+            indicatorstream.save(symbol, new_state)
+
+        # 記憶體只保留到狀態所在的K棒（之後的K棒下次會從狀態重算）
+        done = frame.index.get_loc(pd.Timestamp(new_state["as_of"])) + 1
+        with indicatorstream._lock:
+            indicatorstream._frames[symbol] = frame.iloc[:done]
+            indicatorstream._frames.move_to_end(symbol)
+            while len(indicatorstream._frames) > indicatorstream.memory_size:
+                indicatorstream._frames.popitem(last=False)
+        return frame
+
+    @staticmethod
+    def refresh(symbols):
+        """盤中更新迴圈使用：補抓每個代號的尾端日線並接續計算指標。"""
+        results = {}
+        for symbol in symbols:
+            try:
+                history = pricestore.history(symbol)
+            except Exception:
+                continue
+            if history is not None and not history.empty:
+                results[symbol] = indicatorstream.frame(symbol, history)
+        return results
@@ -0,0 +1,64 @@
+# 資料處理
+import json
+import os
+import time
+from pathlib import Path
+
+from backend.cache import cache_path, atomic_write, prune
+
+
+# 公司資訊快取：每個代號一個 JSON 檔（內含取得時間），在 ttl 內直接讀檔；
+# 檔案修改時間記錄最後使用時間，超過 max_entries 時淘汰最久沒用的
+class infocache:
+    # 公司資訊有效秒數
+    ttl = 24 * 60 * 60
+    # 最多保留的代號數
+    max_entries = 5000
+
+    @staticmethod
+    def path(symbol):
+        return cache_path("info", symbol, ".json")
+
+    @staticmethod
+    def _read(symbol):
+        """讀取快取，回傳 (取得時間, 公司資訊)，沒有或損毀時回傳 (None, None)。"""
+        path = infocache.path(symbol)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            return entry["fetched_at"], entry["info"]
+        except Exception:
+            return None, None
+
+    @staticmethod
+    def _write(symbol, info):
+        text = json.dumps({"fetched_at": time.time(), "info": info}, ensure_ascii=False)
+        path = infocache.path(symbol)
+        atomic_write(path, lambda p: Path(p).write_text(text, encoding="utf-8"))
+        prune(path.parent, "*.json", infocache.max_entries)
+
+    @staticmethod
+    def _touch(symbol):
+        try:
+            os.utime(infocache.path(symbol))
+        except OSError:
+            pass
+
+    @staticmethod
+    def get(symbol, fetch, ttl=None):
+        """取得公司資訊：快取在 ttl 內直接回傳，否則呼叫 fetch() 並寫入快取。
+
+        fetch 失敗或回傳空資料時沿用過期的快取（沒有則回傳空字典），空資料不寫入快取。
+        """
+        ttl = infocache.ttl if ttl is None else ttl
+        fetched_at, info = infocache._read(symbol)
+        if info is not None and time.time() - fetched_at < ttl:
+            infocache._touch(symbol)
+            return info
+        try:
+            fresh = fetch() or {}
+        except Exception:
+            fresh = {}
+        if fresh:
+            infocache._write(symbol, fresh)
+            return fresh
+        return info if info is not None else {}
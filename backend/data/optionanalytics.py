@@ -0,0 +1,150 @@
+# 資料分析
+import numpy as np  # 數值運算
+import pandas as pd  # 資料處理
+import plotly.graph_objects as go  # 繪圖
+
+# Streamlit 前端框架
+import streamlit as st  # Streamlit 模組
+
+from backend.data.greeks import blackscholes  # 希臘字母
+
+
+# 期權彙總分析：最大痛點、賣權/買權比與造市商 Gamma 曝險，以整張期權表（單一或多個到期日）計算
+class optionanalytics:
+    # 每口合約代表的股數
+    multiplier = 100
+
+    @staticmethod
+    def _values(df, name):
+        return pd.to_numeric(df[name], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def _payout(strike, oi, prices):
+        """Σ OI × max(結算價 - 行使價, 0) 與 Σ OI × max(行使價 - 結算價, 0)，以排序後的累積和一次求出所有結算價。"""
+        order = np.argsort(strike, kind="stable")
+        strike, oi = strike[order], oi[order]
+        cum_oi = np.concatenate(([0.0], np.cumsum(oi)))
+        cum_value = np.concatenate(([0.0], np.cumsum(oi * strike)))
+        # 行使價 <= 結算價的合約數
+        below = np.searchsorted(strike, prices, side="right")
+        call = prices * cum_oi[below] - cum_value[below]
+        put = (cum_value[-1] - cum_value[below]) - prices * (cum_oi[-1] - cum_oi[below])
+        return call, put
+
+    @staticmethod
+    def pain(df):
+        """單一到期日在各行使價結算時，買方合計可得的內含價值（即賣方的損失）。
+
+        以累積和計算，不需逐一比對候選結算價與合約；回傳以候選結算價為索引的 Series。
+        """
+        strike = df["strike"].to_numpy(dtype=np.float64)
+        oi = optionanalytics._values(df, "openInterest")
+        is_call = (df["type"] == "call").to_numpy()
+        prices = np.unique(strike)
+        call, _ = optionanalytics._payout(strike[is_call], oi[is_call], prices)
+        _, put = optionanalytics._payout(strike[~is_call], oi[~is_call], prices)
+        return pd.Series((call + put) * optionanalytics.multiplier, index=prices, name="pain")
+
+    @staticmethod
+    def max_pain(surface):
+        """各到期日的最大痛點（買方合計價值最小的結算價）。"""
+        return surface.groupby("expiry", observed=True).apply(
+            lambda df: optionanalytics.pain(df).idxmin()
+        ).rename("max_pain")
+
+    @staticmethod
+    def put_call_ratios(surface):
+        """各到期日與全部合計的成交量、未平倉量賣權/買權比。"""
+        df = surface.assign(
+            volume=pd.to_numeric(surface["volume"], errors="coerce").fillna(0),
+            openInterest=pd.to_numeric(surface["openInterest"], errors="coerce").fillna(0),
+        )
+        sums = df.pivot_table(
+            index="expiry", columns="type", values=["volume", "openInterest"],
+            aggfunc="sum", fill_value=0, observed=True,
+        )
+        sums.loc["合計"] = sums.sum()
+        ratios = pd.DataFrame(index=sums.index)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for name in ("volume", "openInterest"):
+                ratios[f"{name}_pc"] = sums.get((name, "put"), 0) / sums.get((name, "call"), 0)
+        return ratios.replace([np.inf, -np.inf], np.nan)
+
+    @staticmethod
+    def gamma_exposure(surface, spot, rate=None):
+        """每口合約的造市商 Gamma 曝險（標的每變動 1% 時 Delta 的金額變化）。
+
+        假設造市商持有買權多頭、賣權空頭（買權為正、賣權為負）；表中沒有 gamma 欄時以 yfinance 的隱含波動率計算。
+        """
+        if "gamma" in surface:
+            gamma = pd.to_numeric(surface["gamma"], errors="coerce").to_numpy(dtype=np.float64)
+        else:
+            rate = blackscholes.rate if rate is None else rate
+            years = np.maximum(surface["dte"].to_numpy(dtype=np.float64), blackscholes.min_days) / 365
+            sigma = pd.to_numeric(surface["impliedVolatility"], errors="coerce").to_numpy(dtype=np.float64)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                gamma = blackscholes.greeks(
+                    spot, surface["strike"].to_numpy(dtype=np.float64), years, rate,
+                    np.where(sigma > 0, sigma, np.nan), (surface["type"] == "call").to_numpy(),
+                )["gamma"]
+        sign = np.where(surface["type"] == "call", 1.0, -1.0)
+        oi = optionanalytics._values(surface, "openInterest")
+        gex = sign * np.nan_to_num(gamma) * oi * optionanalytics.multiplier * spot * spot * 0.01
+        return pd.Series(gex, index=surface.index, name="gex")
+
+    @staticmethod
+    def gex_by(surface, spot, by="strike"):
+        """依行使價或到期日加總的 Gamma 曝險。"""
+        gex = optionanalytics.gamma_exposure(surface, spot)
+        return gex.groupby(surface[by].to_numpy()).sum().rename_axis(by)
+
+    @staticmethod
+    def summary(surface, spot):
+        """各到期日的最大痛點、賣權/買權比與淨 Gamma 曝險，最後一列為全部合計。"""
+        table = optionanalytics.put_call_ratios(surface)
+        table["max_pain"] = optionanalytics.max_pain(surface)
+        gex = optionanalytics.gex_by(surface, spot, "expiry")
+        table["gex"] = gex
+        table.loc["合計", "gex"] = gex.sum()
+        table.index = [i.strftime("%Y-%m-%d") if isinstance(i, pd.Timestamp) else i for i in table.index]
+        return table.rename(
+            columns={
+                "volume_pc": "成交量賣買比",
+                "openInterest_pc": "未平倉量賣買比",
+                "max_pain": "最大痛點",
+                "gex": "淨Gamma曝險(每1%)",
+            }
+        )[["最大痛點", "成交量賣買比", "未平倉量賣買比", "淨Gamma曝險(每1%)"]]
+
+    @staticmethod
+    def gex_figure(gex, spot=None):
+        fig = go.Figure(
+            go.Bar(
+                x=gex.index, y=gex.to_numpy(),
+                marker_color=np.where(gex.to_numpy() >= 0, "green", "red"),
+            )
+        )
+        if spot:
+            fig.add_vline(x=spot, line_dash="dash", annotation_text="標的價格")
+        fig.update_layout(title="各行使價 Gamma 曝險", xaxis_title="行使價", yaxis_title="Gamma 曝險 (每1%)", height=400)
+        return fig
+
+    @staticmethod
+    def pain_figure(pain):
+        fig = go.Figure(go.Scatter(x=pain.index, y=pain.to_numpy(), mode="lines"))
+        fig.add_vline(x=pain.idxmin(), line_dash="dash", annotation_text=f"最大痛點 {pain.idxmin():g}")
+        fig.update_layout(title="結算價對應的買方合計價值", xaxis_title="結算價", yaxis_title="金額", height=400)
+        return fig
+
+    @staticmethod
+    def plot(surface, spot):
+        """在表格旁顯示彙總表與圖表；單一到期日時另繪最大痛點曲線。"""
+        if surface.empty or not spot:
+            return
+        gex = optionanalytics.gex_by(surface, spot, "strike")
+        near = gex[(gex.index > spot * 0.7) & (gex.index < spot * 1.3)]
+        left, right = st.columns(2)
+        left.dataframe(optionanalytics.summary(surface, spot))
+        right.plotly_chart(optionanalytics.gex_figure(near, spot), use_container_width=True)
+        if surface["expiry"].nunique() == 1:
+            st.plotly_chart(optionanalytics.pain_figure(optionanalytics.pain(surface)), use_container_width=True)
@@ -0,0 +1,191 @@
+# 期權快照歷史庫：每個代號每天一個 Parquet 檔，記錄當天整個期權曲面
+#
+# 目錄結構：<快取>/options/symbol=<代號>/date=<快照日期>/chain.parquet
+# 檔內依合約代號排序（合約代號本身依到期日、買賣權、行使價排列），搭配列群組統計值，
+# 查詢單一合約或行使價時只讀取相符的列群組；合約代號以 Parquet 字典編碼、zstd 壓縮。
+#
+# 用法（每日排程快照整份代號清單）：
+#   python -m backend.data.optionstore universe.txt
+import argparse
+import datetime
+import shutil
+import sys
+import time
+
+import numpy as np  # 數值運算
+import pandas as pd  # 資料處理
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from backend.cache import cache_dir, atomic_write, safe_name
+from backend.data.Option import Option  # 期權鏈
+
+
+class optionstore:
+    # 保存的欄位與型別（數值以 float32 儲存，足以表示報價、未平倉量與波動率）
+    schema = pa.schema(
+        [
+            ("contractSymbol", pa.string()),
+            ("type", pa.string()),
+            ("expiry", pa.date32()),
+            ("strike", pa.float64()),
+            ("lastPrice", pa.float32()),
+            ("bid", pa.float32()),
+            ("ask", pa.float32()),
+            ("volume", pa.float32()),
+            ("openInterest", pa.float32()),
+            ("impliedVolatility", pa.float32()),
+        ]
+    )
+    # 每個列群組的合約數
+    row_group_size = 1024
+    # 當天快照在此秒數內已寫過就不再覆寫（Streamlit 重跑時不會重複寫檔）
+    rewrite_after = Option.ttl
+    # 保留的快照天數（prune 使用）
+    keep_days = 400
+
+    @staticmethod
+    def folder(symbol):
+        return cache_dir("options") / f"symbol={safe_name(symbol)}"
+
+    @staticmethod
+    def path(symbol, date):
+        return optionstore.folder(symbol) / f"date={pd.Timestamp(date):%Y-%m-%d}" / "chain.parquet"
+
+    @staticmethod
+    def _table(surface):
+        """將 Option.surface 的結果轉為固定欄位的 Arrow 表，依合約代號排序。"""
+        df = pd.DataFrame(
+            {
+                "contractSymbol": surface["contractSymbol"].astype(str),
+                "type": surface["type"].astype(str),
+                "expiry": pd.to_datetime(surface["expiry"]).dt.date,
+            }
+        )
+        for name in optionstore.schema.names[3:]:
+            values = surface[name] if name in surface else np.nan
+            df[name] = pd.to_numeric(values, errors="coerce")
+        df = df.sort_values("contractSymbol", kind="stable")
+        return pa.Table.from_pandas(df, schema=optionstore.schema, preserve_index=False)
+
+    @staticmethod
+    def save(symbol, surface, date=None, force=False):
+        """寫入當天快照（同一天重複寫入時覆蓋），回傳是否有寫檔。"""
+        if surface is None or surface.empty:
+            return False
+        path = optionstore.path(symbol, date or datetime.date.today())
+        if not force and path.exists() and time.time() - path.stat().st_mtime < optionstore.rewrite_after:
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = optionstore._table(surface)
+        atomic_write(
+            path,
+            lambda p: pq.write_table(
+                table,
+                p,
+                compression="zstd",
+                use_dictionary=["contractSymbol", "type"],
+                row_group_size=optionstore.row_group_size,
+                write_statistics=True,
+            ),
+        )
+        return True
+
+    @staticmethod
+    def snapshot(symbol):
+        """取得代號所有到期日的期權鏈並寫入當天快照，回傳合約數。"""
+        surface = Option(symbol).surface()
+        optionstore.save(symbol, surface, force=True)
+        return len(surface)
+
+    @staticmethod
+    def dates(symbol):
+        """已有快照的日期（由舊到新）。"""
+        folder = optionstore.folder(symbol)
+        return sorted(
+            pd.Timestamp(p.name.split("=", 1)[1])
+            for p in folder.glob("date=*")
+            if (p / "chain.parquet").exists()
+        )
+
+    @staticmethod
+    def query(symbol, filter=None, columns=None, start=None, end=None):
+        """讀取快照歷史，回傳含 date 欄（快照日期）的表。
+
+        日期範圍只開啟相符日期的檔案，filter（pyarrow 運算式）依列群組統計值略過不相符的列群組。
+        """
+        folder = optionstore.folder(symbol)
+        if not any(folder.glob("date=*")):
+            return pd.DataFrame(columns=["date"] + (columns or optionstore.schema.names))
+        dataset = ds.dataset(
+            folder,
+            format="parquet",
+            partitioning=ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive"),
+        )
+        if start is not None:
+            since = ds.field("date") >= f"{pd.Timestamp(start):%Y-%m-%d}"
+            filter = since if filter is None else filter & since
+        if end is not None:
+            until = ds.field("date") <= f"{pd.Timestamp(end):%Y-%m-%d}"
+            filter = until if filter is None else filter & until
+        names = None if columns is None else ["date"] + [c for c in columns if c != "date"]
+        df = dataset.to_table(columns=names, filter=filter).to_pandas()
+        df["date"] = pd.to_datetime(df["date"])
+        for name in ("contractSymbol", "type"):
+            if name in df:
+                df[name] = df[name].astype("category")
+        return df.sort_values(["date"] + [c for c in ("contractSymbol",) if c in df], ignore_index=True)
+
+    @staticmethod
+    def contract(symbol, contract_symbol, start=None, end=None):
+        """單一合約的每日未平倉量、隱含波動率與報價，以快照日期為索引。"""
+        df = optionstore.query(symbol, ds.field("contractSymbol") == contract_symbol, start=start, end=end)
+        return df.set_index("date").drop(columns=["contractSymbol"])
+
+    @staticmethod
+    def strike(symbol, strike, kind=None, expiry=None, start=None, end=None):
+        """同一行使價（可再限定買賣權與到期日）所有合約的快照歷史。"""
+        condition = ds.field("strike") == float(strike)
+        if kind is not None:
+            condition = condition & (ds.field("type") == kind)
+        if expiry is not None:
+            condition = condition & (ds.field("expiry") == pa.scalar(pd.Timestamp(expiry).date(), pa.date32()))
+        return optionstore.query(symbol, condition, start=start, end=end)
+
+    @staticmethod
+    def prune(keep_days=None):
+        """刪除超過保留天數的快照，回傳刪除的檔案數。"""
+        keep_days = optionstore.keep_days if keep_days is None else keep_days
+        cutoff = pd.Timestamp.today().normalize() - pd.Timedelta(days=keep_days)
+        removed = 0
+        for folder in cache_dir("options").glob("symbol=*/date=*"):
+            if pd.Timestamp(folder.name.split("=", 1)[1]) < cutoff:
+                shutil.rmtree(folder, ignore_errors=True)
+                removed += 1
+        return removed
+
+    @staticmethod
+    def main(argv=None):
+        parser = argparse.ArgumentParser(
+            prog="python -m backend.data.optionstore",
+            description="將代號清單所有到期日的期權鏈寫入當天快照",
+        )
+        parser.add_argument("universe", help="代號清單（每行一個代號）")
+        parser.add_argument("--keep-days", type=int, default=optionstore.keep_days, help="保留的快照天數")
+        args = parser.parse_args(argv)
+
+        with open(args.universe, encoding="utf-8") as f:
+            symbols = list(dict.fromkeys(s.strip().upper() for s in f.read().split() if not s.startswith("#")))
+        for i, symbol in enumerate(symbols, 1):
+            try:
+                count = optionstore.snapshot(symbol)
+                print(f"{i}/{len(symbols)} {symbol} {count} 筆合約")
+            except Exception as exc:
+                print(f"{i}/{len(symbols)} {symbol} 失敗：{exc}")
+        optionstore.prune(args.keep_days)
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(optionstore.main())
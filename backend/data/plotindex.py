@@ -1,10 +1,8 @@
 # 資料分析
+import json
 import pandas as pd  # 資料處理
 import numpy as np  # 資料處理
 
-# 資料擷取與網路相關
-import yfinance as yf  # 股票數據
-
 # 畫圖相關
 import plotly.graph_objs as go  # Plotly 圖表物件
 import plotly.express as px  # Plotly 快速繪圖
@@ -14,6 +12,9 @@ import plotly  # Plotly 主模組
 # Streamlit 前端框架
 import streamlit as st  # Streamlit 模組
 
+from backend.data.daterange import daterange  # 時間範圍切片
+from backend.data.downsample import downsample  # 圖表降採樣
+
 # 1.大盤指數
 class plotindex:
     def tran(self):  # 修改方法签名，添加self参数
@@ -34,32 +35,52 @@ class plotindex:
             "^KS11": "韓國綜合股價指數",
         }
 
-    def __init__(self, period, time, plot_type="index"):
+    # 各面板使用的代號
+    symbols = {
+        "index": [
+            "^IXIC",
+            "^NDX",
+            "^VIX",
+            "^GSPC",
+            "^DJI",
+            "^SOX",
+            "^RUT",
+            "BRK-A",
+        ],
+        "foreign": [
+            "^GSPC",
+            "^IXIC",
+            "^HSI",
+            "^STI",
+            "^TWII",
+            "^N225",
+            "399001.SZ",
+            "^KS11",
+        ],
+    }
+
+    @staticmethod
+    def dashboard_symbols():
+        """大盤指數頁所有面板需要的代號聯集（重複的只取一次）。"""
+        return list(
+            dict.fromkeys(s for group in plotindex.symbols.values() for s in group)
+        )
+
+    @staticmethod
+    def fetch_panel(period):
+        """一次批次取得所有面板共用的收盤價表（欄為代號）。"""
+        return daterange.closes(plotindex.dashboard_symbols(), period)
+
+    def __init__(self, period, time, plot_type="index", panel=None, precomputed=None):
         self.period = period
         self.time = time
         self.plot_type = plot_type
-        self.symbols = {
-            "index": [
-                "^IXIC",
-                "^NDX",
-                "^VIX",
-                "^GSPC",
-                "^DJI",
-                "^SOX",
-                "^RUT",
-                "BRK-A",
-            ],
-            "foreign": [
-                "^GSPC",
-                "^IXIC",
-                "^HSI",
-                "^STI",
-                "^TWII",
-                "^N225",
-                "399001.SZ",
-                "^KS11",
-            ],
-        }
+        # 背景預先算好的結果（見 warmcache），有時直接使用其中的收盤價、成長率與圖表
+        self.precomputed = precomputed
+        if panel is None and precomputed is not None:
+            panel = precomputed["panel"]
+        # 由 fetch_panel 取得、多個面板共用的收盤價表；沒有時各自取得
+        self.panel = panel
         self.symbol_names = {
             "^IXIC": "NASDAQ",
             "^NDX": "NASDAQ 100",
@@ -83,9 +104,8 @@ class plotindex:
         tickers = self.symbols[self.plot_type]
 
         try:
-            data = yf.download(tickers, period=self.period, auto_adjust=False, progress=False)
-            if data is not None and "Close" in data:
-                close_data = data["Close"]
+            close_data = self.closes(tickers)
+            if not close_data.empty:
                 for symbol in tickers:
                     if symbol in close_data:
                         self.data[symbol] = close_data[symbol].dropna()
@@ -94,127 +114,115 @@ class plotindex:
         except Exception as e:
             st.error(f"Error fetching data: {e}")
 
-    def plot_index(self):
-        """Plot the US indexes."""
-        st.subheader(f"美股大盤＆中小企業{self.time}走勢")
+    def closes(self, tickers):
+        """從共用收盤價表取出指定代號；沒有共用表時先取得本面板的代號。"""
+        if self.panel is None:
+            self.panel = daterange.closes(self.symbols[self.plot_type], self.period)
+        return self.panel[[t for t in tickers if t in self.panel]]
 
-        # Create Plotly subplot figure for indexes
-        fig = make_subplots(
-            rows=4,
-            cols=2,
-            subplot_titles=[
-                self.symbol_names[symbol] for symbol in self.symbols["index"]
-            ],
+    def melt_growth(self, prices):
+        """將累積成長率寬表轉為長表，並換成自訂名稱。"""
+        prices = prices.reset_index().melt(
+            id_vars="Date", var_name="Ticker", value_name="Growth (%)"
         )
-
-        for i, symbol in enumerate(self.symbols["index"]):
-            fig.add_trace(
-                go.Scatter(
-                    x=self.data[symbol].index,
-                    y=self.data[symbol].values,
-                    mode="lines",
-                    name=self.symbol_names[symbol],
-                ),
-                row=(i // 2) + 1,
-                col=(i % 2) + 1,
-            )
-
-        fig.update_layout(showlegend=False)
-        st.plotly_chart(fig)
-        with st.expander(f"展開美股大盤＆中小企業{self.time}走勢"):
-            data = pd.DataFrame(self.data)
-            data = data.rename(columns=self.tran())  # 修改为调用tran方法
-            st.dataframe(data)
-
-    def plot_index_vs(self):
-        """Plot comparison of US indexes."""
-        st.subheader(f"美股大盤＆中小企業{self.time}走勢比較")
-        tickers = self.symbols["index"]
-
-        prices = yf.download(tickers, period=self.period, auto_adjust=False, progress=False)
-        if prices is not None and "Close" in prices:
-            prices = prices.dropna()
-            prices = np.log(prices["Close"] / prices["Close"].shift(1))
-            prices = prices.cumsum()
-            prices = (np.exp(prices) - 1) * 100
-            prices = pd.DataFrame(prices)  # Convert to DataFrame
-            prices = prices.reset_index().melt(
-                id_vars="Date", var_name="Ticker", value_name="Growth (%)"
-            )
-        else:
-            st.error("無法取得資料或資料格式錯誤。")
-            return
-
         # Use the custom names in the plot
         prices["Ticker"] = prices["Ticker"].map(self.symbol_names)
-        fig = px.line(prices, x="Date", y="Growth (%)", color="Ticker")
-        fig.update_layout(showlegend=False)
-        st.plotly_chart(fig)
-        with st.expander(f"展開美股大盤＆中小企業{self.time}走勢比較"):
-            st.dataframe(prices)
-
-    def plot_foreign(self):
-        """Plot the foreign indexes."""
-        st.subheader(f"美股大盤＆海外大盤{self.time}走勢")
-
-        # Create Plotly subplot figure for foreign indexes
+        return prices
+
+    def growth(self, tickers):
+        """以對數報酬累加計算累積成長率（%）寬表，取不到資料時回傳空表。"""
+        prices = self.closes(tickers)
+        if prices.empty:
+            return prices
+        prices = prices.dropna()
+        prices = np.log(prices / prices.shift(1))
+        prices = prices.cumsum()
+        prices = (np.exp(prices) - 1) * 100
+        return pd.DataFrame(prices)  # Convert to DataFrame
+
+    def lines_figure(self):
+        """各指數走勢的 4x2 子圖。"""
         fig = make_subplots(
-            rows=4,  # 确保行数与数据数量匹配
+            rows=4,
             cols=2,
             subplot_titles=[
-                self.symbol_names[symbol] for symbol in self.symbols["foreign"]
+                self.symbol_names[symbol] for symbol in self.symbols[self.plot_type]
             ],
         )
 
-        for i, symbol in enumerate(self.symbols["foreign"]):
+        for i, symbol in enumerate(self.symbols[self.plot_type]):
             if symbol in self.data:  # 确保数据存在
-                row = (i // 2) + 1
-                col = (i % 2) + 1
+                # 4x2 子圖每格約半個圖寬
+                series = downsample.line(self.data[symbol], downsample.max_points // 2)
                 fig.add_trace(
                     go.Scatter(
-                        x=self.data[symbol].index,
-                        y=self.data[symbol].values,
+                        x=series.index,
+                        y=series.values,
                         mode="lines",
                         name=self.symbol_names[symbol],
                     ),
-                    row=row,
-                    col=col,
+                    row=(i // 2) + 1,
+                    col=(i % 2) + 1,
                 )
 
         fig.update_layout(showlegend=False)
-        st.plotly_chart(fig)
-        with st.expander(f"展開美股大盤＆海外大盤{self.time}走勢"):
+        return fig
+
+    def growth_figure(self, growth):
+        """累積成長率比較圖。"""
+        plotted = self.melt_growth(downsample.frame(growth))  # 圖表只送降採樣後的點
+        fig = px.line(plotted, x="Date", y="Growth (%)", color="Ticker")
+        fig.update_layout(showlegend=False)
+        return fig
+
+    def figure(self, kind, build):
+        """優先使用背景預先算好的圖表 JSON，沒有時才即時建立。"""
+        if self.precomputed is not None:
+            text = self.precomputed["figures"].get((self.plot_type, kind))
+            if text is not None:
+                return json.loads(text)
+        return build()
+
+    def plot_lines(self, title):
+        """繪製各指數走勢與資料表。"""
+        st.subheader(f"{title}{self.time}走勢")
+        st.plotly_chart(self.figure("lines", self.lines_figure))
+        with st.expander(f"展開{title}{self.time}走勢"):
             data = pd.DataFrame(self.data)
             data = data.rename(columns=self.tran())  # 调用tran方法
             st.dataframe(data)
 
-    def plot_foreign_vs(self):
-        """Plot comparison of foreign indexes."""
-        st.subheader(f"美股大盤＆海外大盤{self.time}走勢比較")
-        tickers = self.symbols["foreign"]
-
-        prices = yf.download(tickers, period=self.period, auto_adjust=False, progress=False)
-        if prices is not None and "Close" in prices:
-            prices = prices.dropna()
-            prices = np.log(prices["Close"] / prices["Close"].shift(1))
-            prices = prices.cumsum()
-            prices = (np.exp(prices) - 1) * 100
-            prices = pd.DataFrame(prices)  # Convert to DataFrame
-            prices = prices.reset_index().melt(
-                id_vars="Date", var_name="Ticker", value_name="Growth (%)"
-            )
-
-            # Use the custom names in the plot
-            prices["Ticker"] = prices["Ticker"].map(self.symbol_names)
-            fig = px.line(prices, x="Date", y="Growth (%)", color="Ticker")
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig)
-            with st.expander(f"展開美股大盤＆海外大盤{self.time}走勢比較"):
-                st.dataframe(prices)
+    def plot_growth(self, title):
+        """繪製累積成長率比較與資料表。"""
+        st.subheader(f"{title}{self.time}走勢比較")
+        if self.precomputed is not None:
+            prices = self.precomputed["growth"][self.plot_type]
         else:
+            prices = self.growth(self.symbols[self.plot_type])
+        if prices.empty:
             st.error("無法取得資料或資料格式錯誤。")
             return
 
+        st.plotly_chart(self.figure("growth", lambda: self.growth_figure(prices)))
+        with st.expander(f"展開{title}{self.time}走勢比較"):
+            st.dataframe(self.melt_growth(prices))
+
+    def plot_index(self):
+        """Plot the US indexes."""
+        self.plot_lines("美股大盤＆中小企業")
+
+    def plot_index_vs(self):
+        """Plot comparison of US indexes."""
+        self.plot_growth("美股大盤＆中小企業")
+
+    def plot_foreign(self):
+        """Plot the foreign indexes."""
+        self.plot_lines("美股大盤＆海外大盤")
+
+    def plot_foreign_vs(self):
+        """Plot comparison of foreign indexes."""
+        self.plot_growth("美股大盤＆海外大盤")
+
     def plot(self):
         """Plot the financial data based on the selected type."""
         self.fetch_data()
@@ -0,0 +1,119 @@
+# 資料分析
+import json
+from pathlib import Path
+
+import numpy as np  # 數值運算
+import pandas as pd  # 資料處理
+
+from backend.cache import atomic_write
+from backend.data.daterange import daterange  # 時間範圍切片
+from backend.data.pricestore import pricestore  # 本地日線價格庫
+
+
+# 精簡的多代號日線面板：所有代號共用一條日期索引，價格以 float32、成交量以 int64 存放，
+# 不保留圖表用不到的 Dividends / Stock Splits；可存成 .npy 目錄並以記憶體映射開啟，
+# 讓多個行程共用同一份資料而不複製
+class pricepanel:
+    fields = ("Open", "High", "Low", "Close")
+
+    def __init__(self, index, symbols, prices, volume):
+        # index: 日期索引（長度 T）；symbols: 代號（長度 N）
+        # prices: (len(fields), T, N) float32，缺值為 NaN；volume: (T, N) int64，缺值為 0
+        self.index = pd.DatetimeIndex(index, name="Date")
+        self.symbols = list(symbols)
+        self.prices = prices
+        self.volume = volume
+        self._columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @staticmethod
+    def from_histories(histories, period="max"):
+        """由 {代號: 日線} 建立面板，日線先依 period 切片。"""
+        frames = {}
+        for symbol, data in histories.items():
+            if data is None or data.empty or "Close" not in data:
+                continue
+            data = daterange.slice_period(data, period)
+            frames[symbol] = data[~data.index.duplicated(keep="last")]
+
+        index = pd.DatetimeIndex([], name="Date")
+        for data in frames.values():
+            index = index.union(data.index)
+
+        prices = np.full((len(pricepanel.fields), len(index), len(frames)), np.nan, dtype=np.float32)
+        volume = np.zeros((len(index), len(frames)), dtype=np.int64)
+        for col, data in enumerate(frames.values()):
+            rows = index.get_indexer(data.index)
+            for k, field in enumerate(pricepanel.fields):
+                source = data[field] if field in data else data["Close"]
+                prices[k, rows, col] = source.to_numpy(dtype=np.float32)
+            if "Volume" in data:
+                volume[rows, col] = data["Volume"].fillna(0).to_numpy(dtype=np.int64)
+        return pricepanel(index, frames.keys(), prices, volume)
+
+    @staticmethod
+    def from_symbols(symbols, period="max"):
+        """以一次批次下載（本地已有的直接讀檔）取得多個代號並建立面板。"""
+        return pricepanel.from_histories(pricestore.history_many(symbols), period)
+
+    def save(self, directory):
+        """存成目錄：prices.npy、volume.npy、index.npy 與 symbols.json。"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        def npy(array):
+            def write(p):
+                with open(p, "wb") as f:
+                    np.save(f, np.ascontiguousarray(array))
+            return write
+
+        atomic_write(directory / "prices.npy", npy(self.prices))
+        atomic_write(directory / "volume.npy", npy(self.volume))
+        # 直接存 datetime64（索引的單位可能是 us 或 ns，不可只存整數）
+        atomic_write(directory / "index.npy", npy(self.index.values.astype("datetime64[ns]")))
+        atomic_write(
+            directory / "symbols.json",
+            lambda p: Path(p).write_text(json.dumps(self.symbols), encoding="utf-8"),
+        )
+
+    @staticmethod
+    def open(directory, mmap=True):
+        """開啟 save 存下的面板；mmap 為 True 時價格與成交量以唯讀記憶體映射載入，不會複製到記憶體。"""
+        directory = Path(directory)
+        mode = "r" if mmap else None
+        symbols = json.loads((directory / "symbols.json").read_text(encoding="utf-8"))
+        index = np.load(directory / "index.npy")
+        if not np.issubdtype(index.dtype, np.datetime64):
+            # 舊版以整數（奈秒）存放
+            index = index.astype("datetime64[ns]")
+        index = pd.DatetimeIndex(index)
+        prices = np.load(directory / "prices.npy", mmap_mode=mode)
+        volume = np.load(directory / "volume.npy", mmap_mode=mode)
+        return pricepanel(index, symbols, prices, volume)
+
+    @property
+    def nbytes(self):
+        return self.prices.nbytes + self.volume.nbytes + self.index.asi8.nbytes
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, symbol):
+        return symbol in self._columns
+
+    def field(self, name, symbols=None):
+        """取得單一欄位的寬表（欄為代號）；成交量為 int64，其餘為 float32。"""
+        cols = slice(None) if symbols is None else [self._columns[s] for s in symbols]
+        names = self.symbols if symbols is None else list(symbols)
+        if name == "Volume":
+            values = self.volume[:, cols]
+        else:
+            values = self.prices[self.fields.index(name)][:, cols]
+        return pd.DataFrame(values, index=self.index, columns=names)
+
+    def frame(self, symbol):
+        """取得單一代號的 OHLCV 日線（去掉該代號沒有資料的日期），格式與 tradedata.getdata 相同。"""
+        col = self._columns[symbol]
+        data = {field: self.prices[k, :, col] for k, field in enumerate(self.fields)}
+        data["Volume"] = self.volume[:, col]
+        data = pd.DataFrame(data, index=self.index)
+        return data[np.isfinite(data["Close"].to_numpy())]
@@ -0,0 +1,214 @@
+# 資料分析
+import os
+import time
+
+import pandas as pd  # 資料處理
+
+# 資料擷取與網路相關
+import yfinance as yf  # 股票數據
+
+from backend.cache import cache_path, atomic_write
+
+
+# 本地日線價格庫：每個代號一個 Parquet 檔，只向上游補抓最後一根K棒之後的資料
+class pricestore:
+    # 距離上次向上游確認超過此秒數才會補抓尾端資料
+    ttl = 15 * 60
+
+    @staticmethod
+    def path(symbol):
+        """取得代號對應的 Parquet 檔路徑。"""
+        return cache_path("prices", symbol, ".parquet")
+
+    @staticmethod
+    def load(symbol):
+        """讀取本地已儲存的日線，沒有則回傳 None。"""
+        path = pricestore.path(symbol)
+        if not path.exists():
+            return None
+        try:
+            return pricestore._normalize(pd.read_parquet(path))
+        except Exception:
+            # 檔案損毀時視為沒有快取，下次會整段重抓
+            return None
+
+    @staticmethod
+    def save(symbol, data):
+        """以原子寫入方式儲存日線。"""
+        atomic_write(pricestore.path(symbol), lambda p: data.to_parquet(p))
+
+    @staticmethod
+    def is_fresh(symbol):
+        """本地檔案是否在 ttl 內確認過（以檔案修改時間記錄最後確認時間）。"""
+        path = pricestore.path(symbol)
+        return path.exists() and time.time() - path.stat().st_mtime < pricestore.ttl
+
+    @staticmethod
+    def _normalize(data):
+        """移除 yfinance 可能回傳的多層欄位，並把索引統一成不含時區的交易日。
+
+        Ticker.history 回傳交易所時區的時間、yf.download 回傳不含時區的日期，
+        統一格式後兩種來源才能合併。
+        """
+        if data is None:
+            return data
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.droplevel(1)
+        if isinstance(data.index, pd.DatetimeIndex):
+            if data.index.tz is not None:
+                data.index = data.index.tz_localize(None)
+            data.index = data.index.normalize()
+            data.index.name = "Date"
+        return data
+
+    @staticmethod
+    def _download(symbol, **kwargs):
+        stock_data = yf.Ticker(symbol).history(**kwargs)
+        return pricestore._normalize(stock_data)
+
+    # 批次下載時每次最多送出的代號數
+    chunk_size = 200
+
+    @staticmethod
+    def _download_batch(symbols, **kwargs):
+        """以 yf.download 批次下載多個代號（依 chunk_size 分段），回傳 {代號: 日線}。"""
+        result = {}
+        for i in range(0, len(symbols), pricestore.chunk_size):
+            chunk = symbols[i : i + pricestore.chunk_size]
+            data = yf.download(
+                chunk,
+                auto_adjust=True,
+                actions=True,
+                group_by="ticker",
+                progress=False,
+                **kwargs,
+            )
+            if data is None or data.empty:
+                continue
+            for symbol in chunk:
+                if isinstance(data.columns, pd.MultiIndex):
+                    if symbol not in data.columns.get_level_values(0):
+                        continue
+                    frame = data[symbol]
+                else:
+                    frame = data
+                # 多個交易所合併後的日期為聯集，去掉該代號沒有收盤價的列
+                if "Close" in frame:
+                    frame = frame[frame["Close"].notna()]
+                else:
+                    frame = frame.dropna(how="all")
+                if not frame.empty:
+                    result[symbol] = pricestore._normalize(frame.copy())
+        return result
+
+    @staticmethod
+    def merge(stored, tail):
+        """以新抓的尾端資料覆蓋重疊的K棒並接在既有資料之後。"""
+        if tail is None or tail.empty:
+            return stored
+        head = stored[stored.index < tail.index[0]]
+        return pd.concat([head, tail[stored.columns.intersection(tail.columns)]])
+
+    @staticmethod
+    def _needs_full_reload(stored, tail):
+        """尾端出現除息或分割時，還原權值的歷史價格會整段改變，必須重抓全部。"""
+        new_bars = tail[tail.index > stored.index[-1]]
+        for col in ("Dividends", "Stock Splits"):
+            if col in new_bars and (new_bars[col].fillna(0) != 0).any():
+                return True
+        return False
+
+    @staticmethod
+    def history(symbol):
+        """取得代號的完整日線：優先讀本地，過期時只補抓最後一根K棒之後的資料。"""
+        stored = pricestore.load(symbol)
+        if stored is not None and not stored.empty and pricestore.is_fresh(symbol):
+            return stored
+
+        try:
+            if stored is None or stored.empty:
+                data = pricestore._download(symbol, period="max")
+            else:
+                # 從最後一根K棒當天開始抓，讓盤中未收完的K棒被更新
+                tail = pricestore._download(symbol, start=stored.index[-1].date())
+                if tail is not None and not tail.empty and pricestore._needs_full_reload(stored, tail):
+                    data = pricestore._download(symbol, period="max")
+                else:
+                    data = pricestore.merge(stored, tail)
+        except Exception:
+            # 上游失敗時退回本地資料，沒有本地資料則交由呼叫端處理
+            if stored is not None:
+                return stored
+            raise
+
+        if data is None or data.empty:
+            return stored if stored is not None else data
+
+        if data is stored:
+            # 沒有新資料，只更新確認時間
+            os.utime(pricestore.path(symbol))
+        else:
+            pricestore.save(symbol, data)
+        return data
+
+    @staticmethod
+    def history_many(symbols):
+        """一次取得多個代號的完整日線，回傳 {代號: 日線}。
+
+        本地新鮮的直接讀檔；沒有快取的合併成一次 period="max" 批次下載，
+        過期的合併成一次從最早最後K棒起算的批次下載，因此最多兩次上游請求。
+        """
+        symbols = list(dict.fromkeys(symbols))
+        result, stale, missing = {}, {}, []
+        for symbol in symbols:
+            stored = pricestore.load(symbol)
+            if stored is None or stored.empty:
+                missing.append(symbol)
+            elif pricestore.is_fresh(symbol):
+                result[symbol] = stored
+            else:
+                stale[symbol] = stored
+
+        if missing:
+            try:
+                downloaded = pricestore._download_batch(missing, period="max")
+            except Exception:
+                downloaded = {}
+            for symbol, data in downloaded.items():
+                pricestore.save(symbol, data)
+                result[symbol] = data
+
+        if stale:
+            start = min(stored.index[-1] for stored in stale.values()).date()
+            try:
+                tails = pricestore._download_batch(list(stale), start=start)
+            except Exception:
+                # 上游失敗時沿用本地資料，不更新確認時間（保持過期，下次再試）
+                result.update(stale)
+                return result
+            for symbol, stored in stale.items():
+                tail = tails.get(symbol)
+                if tail is None or tail.empty:
+                    # 批次結果缺少此代號（個別下載失敗），同樣保持過期
+                    result[symbol] = stored
+                elif pricestore._needs_full_reload(stored, tail):
+                    # 除權息少見，個別整段重抓；成功才覆寫，失敗時沿用本地資料（保持過期，下次再試）
+                    try:
+                        data = pricestore._download(symbol, period="max")
+                    except Exception:
+                        data = None
+                    if data is None or data.empty:
+                        result[symbol] = stored
+                    else:
+                        pricestore.save(symbol, data)
+                        result[symbol] = data
+                else:
+                    data = pricestore.merge(stored, tail)
+                    if data.equals(stored):
+                        # 下載成功但沒有新資料，只更新確認時間
+                        os.utime(pricestore.path(symbol))
+                        result[symbol] = stored
+                    else:
+                        pricestore.save(symbol, data)
+                        result[symbol] = data
+        return result
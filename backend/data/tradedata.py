@@ -1,41 +1,30 @@
-# 資料分析
-import pandas as pd  # 資料處理
-
-# 資料擷取與網路相關
-import yfinance as yf  # 股票數據
-
 # 畫圖相關
 import plotly.graph_objs as go  # Plotly 圖表物件
 import plotly.express as px  # Plotly 快速繪圖
 from plotly.subplots import make_subplots  # 子圖支援
 import plotly  # Plotly 主模組
 
-# 財務技術分析
-from ta.trend import MACD  # MACD 技術指標
-from ta.momentum import StochasticOscillator, RSIIndicator  # 隨機震盪與 RSI 技術指標
-
 # Streamlit 前端框架
 import streamlit as st  # Streamlit 模組
 
+from backend.data.daterange import daterange  # 時間範圍切片
+from backend.data.pricestore import pricestore  # 本地日線價格庫
+from backend.data.indicators import indicators, indicatorstream  # 技術指標
+from backend.data.downsample import downsample  # 圖表降採樣
+from backend.data.figures import figures  # 圖表建構與快取
+
 # 5.交易數據
 class tradedata:
 
     @staticmethod
     def getdata(symbol, time_range):
-        """根據時間範圍下載股票數據。"""
-        stock_data = yf.Ticker(symbol)
-        stock_data = stock_data.history(period=time_range)
-        if isinstance(stock_data.columns, pd.MultiIndex):
-            stock_data.columns = stock_data.columns.droplevel(1)  # 移除 'NVDA' 層級
-        return stock_data
+        """根據時間範圍取得股票數據（由完整日線在本地切片，只補抓缺少的尾端）。"""
+        return daterange.history(symbol, period=time_range)
 
     @staticmethod
     def get_data_time_range(symbol, start, end):
-        """根據開始和結束日期下載股票數據。"""
-        stock_data = yf.download(symbol, start=start, end=end,auto_adjust=False,progress=False)
-        if stock_data is not None and isinstance(stock_data.columns, pd.MultiIndex):
-            stock_data.columns = stock_data.columns.droplevel(1)  # 移除 'NVDA' 層級
-        return stock_data
+        """根據開始和結束日期取得股票數據（由完整日線在本地切片）。"""
+        return daterange.history(symbol, start=start, end=end)
 
     @staticmethod
     def calculate_difference(stock_data, period_days):
@@ -53,8 +42,49 @@ class tradedata:
         return price_difference, percent_difference
 
     @staticmethod
-    def plot_kline(stock_data):
-        """繪製K線圖和技術指標。"""
+    def getindicators(symbol, stock_data):
+        """以完整歷史接續計算的指標，對齊到 stock_data 的日期（區間開頭不會因暖機而空白）。"""
+        history = pricestore.history(symbol)
+        if history is None or history.empty:
+            return indicators.compute(stock_data)
+        return indicatorstream.frame(symbol, history).reindex(stock_data.index)
+
+    # K線圖使用的指標組合（納入圖表快取的 key）
+    kline_indicators = ("sma5", "sma20", "sma60", "rsi", "macd", "macd_signal", "macd_hist")
+
+    @staticmethod
+    def plot_kline(stock_data, ind=None, max_points=None, symbol=None):
+        """繪製K線圖和技術指標；ind 為預先算好的指標，沒有時依 stock_data 計算。
+
+        有提供 symbol 時，完成的圖表以 (代號, 區間, 最後一根K棒, 指標組合) 為 key 快取。
+        """
+        if symbol is None:
+            fig = tradedata.kline_figure(stock_data, ind, max_points)
+        else:
+            last = stock_data.iloc[-1]
+            key = (
+                "kline",
+                symbol,
+                str(stock_data.index[0]),
+                str(stock_data.index[-1]),
+                len(stock_data),
+                float(last["Close"]),
+                float(last["Volume"]),
+                tradedata.kline_indicators,
+                max_points or downsample.max_points,
+            )
+            fig = figures.cached(
+                key, lambda: tradedata.kline_figure(stock_data, ind, max_points)
+            )
+        st.plotly_chart(fig, use_container_width=True)
+
+    @staticmethod
+    def kline_figure(stock_data, ind=None, max_points=None):
+        """建立K線圖和技術指標的 Figure。
+
+        K棒數超過 max_points（預設 downsample.max_points）時，K線與成交量以桶合併、
+        指標線以 min/max 降採樣，短區間維持完整解析度。
+        """
         fig = make_subplots(
             rows=4,
             cols=1,
@@ -63,25 +93,28 @@ class tradedata:
             row_heights=[0.8, 0.5, 0.5, 0.5],
         )
 
-        # 計算移動平均線
-        mav5 = stock_data["Close"].rolling(window=5).mean()
-        mav20 = stock_data["Close"].rolling(window=20).mean()
-        mav60 = stock_data["Close"].rolling(window=60).mean()
+        # 一次計算移動平均線、RSI 和 MACD
+        if ind is None:
+            ind = indicators.compute(stock_data)
+        mav5 = downsample.line(ind["sma5"], max_points)
+        mav20 = downsample.line(ind["sma20"], max_points)
+        mav60 = downsample.line(ind["sma60"], max_points)
+        rsi = downsample.line(ind["rsi"], max_points)
+        macd_line = downsample.line(ind["macd"], max_points)
+        macd_signal = downsample.line(ind["macd_signal"], max_points)
 
-        # 計算RSI和MACD
-        rsi = RSIIndicator(close=stock_data["Close"], window=14)
-        macd = MACD(
-            close=stock_data["Close"], window_slow=26, window_fast=12, window_sign=9
-        )
+        # K線與成交量依桶合併
+        candles = downsample.ohlc(stock_data, max_points)
+        macd_hist = downsample.bucket_last(ind["macd_hist"], len(stock_data), max_points)
 
         # K線圖
         fig.add_trace(
             go.Candlestick(
-                x=stock_data.index,
-                open=stock_data["Open"],
-                high=stock_data["High"],
-                low=stock_data["Low"],
-                close=stock_data["Close"],
+                x=candles.index,
+                open=candles["Open"],
+                high=candles["High"],
+                low=candles["Low"],
+                close=candles["Close"],
                 hovertext="K線",
                 hoverinfo="text",
             ),
@@ -93,7 +126,7 @@ class tradedata:
         # 繪製移動平均線
         fig.add_trace(
             go.Scatter(
-                x=stock_data.index,
+                x=mav5.index,
                 y=mav5,
                 line=dict(color="blue", width=2),
                 name="5-mav",
@@ -103,7 +136,7 @@ class tradedata:
         )
         fig.add_trace(
             go.Scatter(
-                x=stock_data.index,
+                x=mav20.index,
                 y=mav20,
                 line=dict(color="orange", width=2),
                 name="20-mav",
@@ -113,7 +146,7 @@ class tradedata:
         )
         fig.add_trace(
             go.Scatter(
-                x=stock_data.index,
+                x=mav60.index,
                 y=mav60,
                 line=dict(color="purple", width=2),
                 name="60-mav",
@@ -123,14 +156,11 @@ class tradedata:
         )
 
         # 交易量條形圖
-        colors = [
-            "green" if row["Open"] - row["Close"] >= 0 else "red"
-            for _, row in stock_data.iterrows()
-        ]
+        colors = figures.updown_colors(candles["Open"], candles["Close"])
         fig.add_trace(
             go.Bar(
-                x=stock_data.index,
-                y=stock_data["Volume"],
+                x=candles.index,
+                y=candles["Volume"],
                 marker_color=colors,
                 name="交易量",
             ),
@@ -138,44 +168,26 @@ class tradedata:
             col=1,
         )
 
-        # RSI指標
+        # RSI指標（超買/超賣為水平參考線，不必送出整條等長序列）
         fig.add_trace(
             go.Scatter(
-                x=stock_data.index,
-                y=rsi.rsi(),
+                x=rsi.index,
+                y=rsi,
                 line=dict(color="purple", width=2),
                 name="RSI",
             ),
             row=3,
             col=1,
         )
-        fig.add_trace(
-            go.Scatter(
-                x=stock_data.index,
-                y=[70] * len(stock_data.index),
-                line=dict(color="red", width=1),
-                name="超買",
-            ),
-            row=3,
-            col=1,
-        )
-        fig.add_trace(
-            go.Scatter(
-                x=stock_data.index,
-                y=[30] * len(stock_data.index),
-                line=dict(color="green", width=1),
-                name="超賣",
-            ),
-            row=3,
-            col=1,
-        )
+        fig.add_hline(y=70, line=dict(color="red", width=1), row=3, col=1)
+        fig.add_hline(y=30, line=dict(color="green", width=1), row=3, col=1)
 
         # MACD指標
-        colorsM = ["green" if val >= 0 else "red" for val in macd.macd_diff()]
+        colorsM = figures.sign_colors(macd_hist)
         fig.add_trace(
             go.Bar(
-                x=stock_data.index,
-                y=macd.macd_diff(),
+                x=candles.index,
+                y=macd_hist,
                 marker_color=colorsM,
                 name="MACD 差異",
             ),
@@ -184,8 +196,8 @@ class tradedata:
         )
         fig.add_trace(
             go.Scatter(
-                x=stock_data.index,
-                y=macd.macd(),
+                x=macd_line.index,
+                y=macd_line,
                 line=dict(color="orange", width=2),
                 name="MACD",
             ),
@@ -194,8 +206,8 @@ class tradedata:
         )
         fig.add_trace(
             go.Scatter(
-                x=stock_data.index,
-                y=macd.macd_signal(),
+                x=macd_signal.index,
+                y=macd_signal,
                 line=dict(color="blue", width=1),
                 name="MACD 信號",
             ),
@@ -210,4 +222,4 @@ class tradedata:
         fig.update_yaxes(title_text="MACD", row=4, col=1)
 
         fig.update_layout(showlegend=False)
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
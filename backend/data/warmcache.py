@@ -0,0 +1,121 @@
+# 資料分析
+import datetime
+import os
+import threading
+import time
+from zoneinfo import ZoneInfo
+
+import pandas as pd  # 資料處理
+
+from backend.cache import cache_dir, atomic_write
+from backend.data.plotindex import plotindex  # 大盤指數
+
+
+# 大盤指數預先計算：背景執行緒定時（以及每天美股收盤後）把每個時長的收盤價、
+# 累積成長率與圖表 JSON 算好存檔，頁面載入時直接讀取
+class warmcache:
+    # 與大盤指數頁的時長選單相同
+    periods = ["1mo", "3mo", "6mo", "ytd", "1y", "2y", "5y", "10y", "max"]
+    # 定時更新間隔（秒）
+    interval = 15 * 60
+    # 收盤後延遲多久再更新（秒），讓上游資料就緒
+    close_delay = 10 * 60
+    # 超過此秒數未更新的結果視為過期，頁面改為即時計算
+    max_age = 6 * 60 * 60
+    market_tz = ZoneInfo("America/New_York")
+    market_close = datetime.time(16, 0)
+
+    _thread = None
+    _lock = threading.Lock()
+    # 行程內記憶：{period: (檔案修改時間, 結果)}，避免每次載入都重新讀檔
+    _loaded = {}
+
+    @staticmethod
+    def path(period):
+        return cache_dir("dashboard") / f"{period}.pkl"
+
+    @staticmethod
+    def build(period):
+        """計算單一時長的收盤價、各面板累積成長率與圖表 JSON。"""
+        panel = plotindex.fetch_panel(period)
+        if panel.empty:
+            return None
+        result = {"generated_at": time.time(), "panel": panel, "growth": {}, "figures": {}}
+        for plot_type in plotindex.symbols:
+            view = plotindex(period, "", plot_type, panel=panel)
+            view.fetch_data()
+            growth = view.growth(plotindex.symbols[plot_type])
+            result["growth"][plot_type] = growth
+            result["figures"][(plot_type, "lines")] = view.lines_figure().to_json()
+            if not growth.empty:
+                result["figures"][(plot_type, "growth")] = view.growth_figure(growth).to_json()
+        return result
+
+    @staticmethod
+    def refresh_all():
+        """更新所有時長的預先計算結果。"""
+        for period in warmcache.periods:
+            try:
+                result = warmcache.build(period)
+            except Exception:
+                continue
+            if result is not None:
+                atomic_write(warmcache.path(period), lambda p: pd.to_pickle(result, p))
+
+    @staticmethod
+    def load(period):
+        """讀取預先計算結果，沒有或已過期時回傳 None。"""
+        path = warmcache.path(period)
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            return None
+        if time.time() - mtime > warmcache.max_age:
+            return None
+        cached = warmcache._loaded.get(period)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            result = pd.read_pickle(path)
+        except Exception:
+            return None
+        warmcache._loaded[period] = (mtime, result)
+        return result
+
+    @staticmethod
+    def seconds_until_next_run(now=None):
+        """距離下次更新的秒數：取定時間隔與下一個交易日收盤後兩者較早者。"""
+        now = now or datetime.datetime.now(warmcache.market_tz)
+        target = datetime.datetime.combine(
+            now.date(), warmcache.market_close, tzinfo=warmcache.market_tz
+        ) + datetime.timedelta(seconds=warmcache.close_delay)
+        while target <= now or target.weekday() >= 5:
+            target += datetime.timedelta(days=1)
+        return max(1.0, min(warmcache.interval, (target - now).total_seconds()))
+
+    @staticmethod
+    def run_forever():
+        """不斷更新；可在背景執行緒或獨立行程（python -m backend.data.warmcache）執行。"""
+        while True:
+            warmcache.refresh_all()
+            time.sleep(warmcache.seconds_until_next_run())
+
+    @staticmethod
+    def start():
+        """啟動背景更新執行緒（同一行程只會啟動一次）。
+
+        設定環境變數 MARKETINFO_WARMCACHE=off 可停用，改由獨立行程負責更新。
+        """
+        if os.environ.get("MARKETINFO_WARMCACHE", "").lower() == "off":
+            return
+        with warmcache._lock:
+            if warmcache._thread is not None and warmcache._thread.is_alive():
+                return
+            warmcache._thread = threading.Thread(
+                target=warmcache.run_forever, name="warmcache", daemon=True
+            )
+            warmcache._thread.start()
+
+
+if __name__ == "__main__":
+    warmcache.run_forever()
@@ -0,0 +1,128 @@
+# 資料分析
+import re
+
+import numpy as np  # 數值運算
+import pandas as pd  # 資料處理
+
+# Streamlit 前端框架
+import streamlit as st  # Streamlit 模組
+
+from backend.data.pricepanel import pricepanel  # 精簡日線面板
+
+
+# 自選股清單：多個代號一次批次取得日線，指標以整張表向量化計算
+class watchlist:
+    # 與交易數據頁相同的時長對應的交易日數（None 表示從區間第一根K棒起算）
+    period_days = {
+        "1mo": 21,
+        "3mo": 63,
+        "6mo": 126,
+        "ytd": None,
+        "1y": 252,
+        "2y": 252 * 2,
+        "5y": 252 * 5,
+        "10y": 252 * 10,
+        "max": None,
+    }
+    # 走勢小圖每個代號保留的點數
+    spark_points = 60
+
+    @staticmethod
+    def parse_symbols(text):
+        """將以逗號、空白或換行分隔的代號轉為大寫並去除重複。"""
+        symbols = [s.strip().upper() for s in re.split(r"[\s,;，]+", text or "")]
+        return list(dict.fromkeys(s for s in symbols if s))
+
+    @staticmethod
+    def fetch(symbols, period):
+        """一次取得多個代號的日線，回傳共用日期索引的精簡面板。"""
+        return pricepanel.from_symbols(symbols, period)
+
+    @staticmethod
+    def metrics(panel, period_days=None):
+        """以整張表計算每個代號的最新收盤價、區間漲跌、最高價與最低價。
+
+        區間漲跌與 tradedata.calculate_difference 相同：取倒數第 period_days 根K棒，
+        K棒數不足（或 period_days 為 None）時取第一根。
+        """
+        close = panel.field("Close")
+        if close.empty:
+            return pd.DataFrame(
+                columns=["最新收盤價", "漲跌", "漲跌幅(%)", "最高價", "最低價"]
+            )
+        values = close.to_numpy(dtype=np.float64)
+        valid = np.isfinite(values)
+        # 每個代號各自的有效K棒序號（1 起算），不同交易所的休市日不影響計數
+        rank = np.cumsum(valid, axis=0)
+        counts = rank[-1]
+        if period_days is None:
+            target = np.ones_like(counts)
+        else:
+            target = np.where(counts > period_days, counts - period_days + 1, 1)
+
+        def pick(ranks):
+            mask = valid & (rank == ranks)
+            return np.where(mask, values, 0.0).sum(axis=0)
+
+        latest = pick(counts)
+        previous = pick(target)
+        difference = latest - previous
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.where(previous != 0, difference / previous * 100, 0.0)
+
+        return pd.DataFrame(
+            {
+                "最新收盤價": latest,
+                "漲跌": difference,
+                "漲跌幅(%)": percent,
+                "最高價": np.nanmax(panel.field("High").to_numpy(dtype=np.float64), axis=0),
+                "最低價": np.nanmin(panel.field("Low").to_numpy(dtype=np.float64), axis=0),
+            },
+            index=close.columns,
+        )
+
+    @staticmethod
+    def sparklines(close, points=None):
+        """每個代號取等距的 points 個收盤價作為走勢小圖，回傳 {代號: 價格串列}。"""
+        points = points or watchlist.spark_points
+        if close.empty:
+            return {}
+        filled = close.ffill().bfill().to_numpy(dtype=np.float64)
+        rows = np.unique(np.linspace(0, len(filled) - 1, points).round().astype(int))
+        sampled = filled[rows].T.round(4)
+        return dict(zip(close.columns, sampled.tolist()))
+
+    @staticmethod
+    def table(symbols, period):
+        """產生自選股總表（含走勢小圖欄），沒有任何資料時回傳空表。"""
+        panel = watchlist.fetch(symbols, period)
+        result = watchlist.metrics(panel, watchlist.period_days.get(period))
+        if result.empty:
+            return result
+        result.insert(0, "走勢", pd.Series(watchlist.sparklines(panel.field("Close"))))
+        result.index.name = "代號"
+        return result
+
+    @staticmethod
+    def plot(symbols, period, time):
+        """繪製自選股總表與走勢小圖。"""
+        result = watchlist.table(symbols, period)
+        missing = [s for s in symbols if s not in result.index]
+        if result.empty:
+            st.error("查無資料")
+            return
+        if missing:
+            st.warning(f"查無數據：{', '.join(missing)}")
+        st.subheader(f"自選股{time}走勢")
+        st.dataframe(
+            result,
+            use_container_width=True,
+            column_config={
+                "走勢": st.column_config.LineChartColumn(f"{time}走勢", width="medium"),
+                "最新收盤價": st.column_config.NumberColumn(format="$%.2f"),
+                "漲跌": st.column_config.NumberColumn(format="$%.2f"),
+                "漲跌幅(%)": st.column_config.NumberColumn(format="%+.2f%%"),
+                "最高價": st.column_config.NumberColumn(f"{time}最高價", format="$%.2f"),
+                "最低價": st.column_config.NumberColumn(f"{time}最低價", format="$%.2f"),
+            },
+        )
@@ -0,0 +1,107 @@
+# 資料分析
+import concurrent.futures
+from typing import NamedTuple, Optional
+
+import pandas as pd  # 資料處理
+
+# 資料擷取與網路相關
+import yfinance as yf  # 股票數據
+
+from backend.finrepot.planner import translationplan  # 翻譯規劃
+from backend.finrepot.statementstore import statementstore  # 財報期別庫
+
+
+# 一次查詢取得的財務報表；沒有要求或取得失敗的報表為 None，失敗原因記在 errors
+class statementbundle(NamedTuple):
+    symbol: str
+    balance_sheet: Optional[pd.DataFrame] = None
+    income_stmt: Optional[pd.DataFrame] = None
+    cash_flow: Optional[pd.DataFrame] = None
+    quarterly_balance_sheet: Optional[pd.DataFrame] = None
+    quarterly_income_stmt: Optional[pd.DataFrame] = None
+    quarterly_cash_flow: Optional[pd.DataFrame] = None
+    errors: Optional[dict] = None
+
+
+# 財務報表載入：年報、季報各報表同時向上游請求
+class statementloader:
+    # 報表欄位 -> yf.Ticker 屬性
+    annual = {
+        "balance_sheet": "balance_sheet",
+        "income_stmt": "income_stmt",
+        "cash_flow": "cashflow",
+    }
+    quarterly = {
+        "quarterly_balance_sheet": "quarterly_balance_sheet",
+        "quarterly_income_stmt": "quarterly_income_stmt",
+        "quarterly_cash_flow": "quarterly_cashflow",
+    }
+    # 同時請求的報表數
+    max_workers = 6
+    # 每張報表最長等待秒數
+    timeout = 20
+
+    @staticmethod
+    def _fetch(symbol, attr):
+        # 每個執行緒各自建立 Ticker，避免共用物件的延遲初始化互相干擾
+        return getattr(yf.Ticker(symbol), attr)
+
+    @staticmethod
+    def _load(symbol, field, attr):
+        """已結束的期別讀本地，只有可能有新期別時才向上游請求。"""
+        return statementstore.statement(
+            symbol, field, lambda: statementloader._fetch(symbol, attr)
+        )
+
+    @staticmethod
+    def load(symbol, annual=True, quarterly=False, max_workers=None, timeout=None):
+        """同時取得要求的報表，回傳 statementbundle；逾時或失敗的報表為 None 並記錄於 errors。"""
+        timeout = statementloader.timeout if timeout is None else timeout
+        wanted = {}
+        if annual:
+            wanted.update(statementloader.annual)
+        if quarterly:
+            wanted.update(statementloader.quarterly)
+
+        results, errors = {}, {}
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers or statementloader.max_workers
+        )
+        try:
+            futures = {
+                field: executor.submit(statementloader._load, symbol, field, attr)
+                for field, attr in wanted.items()
+            }
+            # 所有報表同時開始，逾時以整批的截止時間計算
+            done, pending = concurrent.futures.wait(futures.values(), timeout=timeout)
+            for field, future in futures.items():
+                if future in pending:
+                    # 逾時時先用本地已存的期別
+                    stored = statementstore.load(symbol, field)
+                    if stored is not None:
+                        results[field] = stored
+                    errors[field] = f"逾時（超過 {timeout} 秒）"
+                    continue
+                try:
+                    results[field] = future.result()
+                except Exception as e:
+                    errors[field] = str(e)
+        finally:
+            # 不等待逾時的請求結束
+            executor.shutdown(wait=False, cancel_futures=True)
+        return statementbundle(symbol, errors=errors, **results)
+
+    @staticmethod
+    def frames(bundle):
+        """bundle 中所有報表欄位名稱與內容。"""
+        return {
+            field: getattr(bundle, field)
+            for field in (*statementloader.annual, *statementloader.quarterly)
+        }
+
+    @staticmethod
+    def translate(bundle, target_language="zh-TW"):
+        """把 bundle 中所有報表（年報與季報）的標籤合併後一次翻譯。"""
+        frames = statementloader.frames(bundle)
+        translated = translationplan.apply(frames.values(), target_language)
+        return bundle._replace(**dict(zip(frames, translated)))
@@ -0,0 +1,78 @@
+# 資料分析
+import datetime
+import numbers
+import re
+
+import pandas as pd  # 資料處理
+
+from backend.finrepot.translation import translationmemory  # 翻譯記憶
+
+
+# 財報翻譯規劃：先收集所有報表（年報、季報皆可）的列名與欄名，
+# 排除日期與數字、去除重複後一次翻譯，再對應回各報表
+class translationplan:
+    # 看起來像日期或數字的字串（如 "2023-09-30"、"2023-09-30 00:00:00"、"1,234.5"）不需翻譯
+    _not_text = re.compile(
+        r"^\s*(\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2})?)?|[-+]?[\d,]*\.?\d+(e[-+]?\d+)?%?)\s*$",
+        re.IGNORECASE,
+    )
+
+    @staticmethod
+    def is_text(label):
+        """標籤是否為需要翻譯的文字（排除日期、時間戳記、數字與空字串）。"""
+        if label is None or isinstance(label, (numbers.Number, datetime.date, pd.Timestamp)):
+            return False
+        if not isinstance(label, str):
+            return False
+        return bool(label.strip()) and not translationplan._not_text.match(label)
+
+    @staticmethod
+    def _labels(index):
+        """取出索引（含多層索引各層）的所有標籤。"""
+        if isinstance(index, pd.MultiIndex):
+            return [label for level in index.levels for label in level]
+        return list(index)
+
+    @staticmethod
+    def collect(frames):
+        """收集所有報表需要翻譯的列名與欄名（去除重複，順序不變）。"""
+        texts = []
+        for df in frames:
+            if df is None or df.empty:
+                continue
+            for index in (df.columns, df.index):
+                texts.extend(l for l in translationplan._labels(index) if translationplan.is_text(l))
+        return list(dict.fromkeys(texts))
+
+    @staticmethod
+    def _rename(label, mapping):
+        if translationplan.is_text(label):
+            return mapping.get(label, label)
+        if isinstance(label, (datetime.date, pd.Timestamp)):
+            # 財報期別只顯示日期
+            return pd.Timestamp(label).strftime("%Y-%m-%d")
+        return label
+
+    @staticmethod
+    def _apply_index(index, mapping):
+        if isinstance(index, pd.MultiIndex):
+            return pd.MultiIndex.from_tuples(
+                [tuple(translationplan._rename(l, mapping) for l in t) for t in index],
+                names=index.names,
+            )
+        return pd.Index([translationplan._rename(l, mapping) for l in index], name=index.name)
+
+    @staticmethod
+    def apply(frames, target_language="zh-TW"):
+        """翻譯多張報表的列名與欄名：所有報表共用一次翻譯，回傳翻譯後的報表串列（None 原樣保留）。"""
+        frames = list(frames)
+        texts = translationplan.collect(frames)
+        mapping = dict(zip(texts, translationmemory.translate(texts, "en", target_language)))
+        result = []
+        for df in frames:
+            if df is not None and not df.empty:
+                df = df.copy()
+                df.columns = translationplan._apply_index(df.columns, mapping)
+                df.index = translationplan._apply_index(df.index, mapping)
+            result.append(df)
+        return result
@@ -1,12 +1,9 @@
 # 資料分析
 import pandas as pd  # 資料處理
 
-# 資料擷取與網路相關
-import yfinance as yf  # 股票數據
-
 # 翻譯
-from deep_translator import GoogleTranslator
-import concurrent.futures
+from backend.finrepot.planner import translationplan  # 翻譯規劃
+from backend.finrepot.loader import statementloader  # 財報載入
 
 # Streamlit 前端框架
 import streamlit as st  # Streamlit 模組
@@ -20,44 +17,6 @@ class financialreport_q:
         self.quarterly_incomestmt = None
         self.quarterly_cashflow = None
 
-    # 多進程翻譯函數
-    def tran(self, texts):
-        translator = GoogleTranslator(source="en", target=self.target_language)
-        # 使用多進程進行批量翻譯
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            tran = list(executor.map(translator.translate, texts))
-        return tran
-
-    # 使用多進程翻譯DataFrame的列名和索引名
-    def tran_df(self, df):
-        if df is not None and not df.empty:
-            # 多進程翻譯列名
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = pd.MultiIndex.from_tuples(
-                    [
-                        tuple(self.tran([str(col) for col in level]))
-                        for level in df.columns.levels
-                    ]
-                )
-            else:
-                df.columns = self.tran([str(col) for col in df.columns])
-
-            # 多進程翻譯索引名
-            if isinstance(df.index, pd.MultiIndex):
-                df.index = pd.MultiIndex.from_tuples(
-                    [
-                        tuple(self.tran([str(idx) for idx in level]))
-                        for level in df.index.levels
-                    ]
-                )
-            else:
-                df.index = self.tran([str(idx) for idx in df.index])
-
-            # 處理重複的列名
-            df = self.remove_col(df)
-
-        return df
-
     # 處理重複列名
     def remove_col(self, df):
         cols = pd.Series(df.columns)
@@ -66,31 +25,31 @@ class financialreport_q:
             df.columns = cols
         return df
 
-    # 獲取季度財務報表
-    def get_financial_q(self):
-        try:
-            stock = yf.Ticker(self.symbol)
-            self.quarterly_balancesheet = stock.quarterly_balancesheet
-            self.quarterly_incomestmt = stock.quarterly_incomestmt
-            self.quarterly_cashflow = stock.quarterly_cashflow
-        except Exception as e:
-            st.error(f"獲取財務報表發生錯誤：{str(e)}")
-            (
-                self.quarterly_balancesheet,
-                self.quarterly_incomestmt,
-                self.quarterly_cashflow,
-            ) = (None, None, None)
+    # 獲取季度財務報表（三張報表同時請求；可傳入已載入的 statementbundle）
+    def get_financial_q(self, bundle=None):
+        if bundle is None:
+            bundle = statementloader.load(self.symbol, annual=False, quarterly=True)
+        self.quarterly_balancesheet = bundle.quarterly_balance_sheet
+        self.quarterly_incomestmt = bundle.quarterly_income_stmt
+        self.quarterly_cashflow = bundle.quarterly_cash_flow
+        for field in statementloader.quarterly:
+            if field in (bundle.errors or {}):
+                st.error(f"獲取財務報表發生錯誤：{bundle.errors[field]}")
 
     # 翻譯季度財務報表
     def tran_financial_q(self):
-        if self.quarterly_balancesheet is not None:
-            self.quarterly_balancesheet = self.tran_df(self.quarterly_balancesheet)
-        if self.quarterly_incomestmt is not None:
-            self.quarterly_incomestmt = self.tran_df(
-                self.quarterly_incomestmt
+        # 三張報表的標籤合併後一次翻譯
+        (
+            self.quarterly_balancesheet,
+            self.quarterly_incomestmt,
+            self.quarterly_cashflow,
+        ) = [
+            self.remove_col(df) if df is not None and not df.empty else df
+            for df in translationplan.apply(
+                [self.quarterly_balancesheet, self.quarterly_incomestmt, self.quarterly_cashflow],
+                self.target_language,
             )
-        if self.quarterly_cashflow is not None:
-            self.quarterly_cashflow = self.tran_df(self.quarterly_cashflow)
+        ]
 
     # 顯示季度財務報表
     def display_financial_q(self):
@@ -0,0 +1,182 @@
+# 資料分析
+import concurrent.futures
+
+import numpy as np  # 數值運算
+import pandas as pd  # 資料處理
+
+# 畫圖相關
+import plotly.express as px  # Plotly 快速繪圖
+
+# Streamlit 前端框架
+import streamlit as st  # Streamlit 模組
+
+from backend.finrepot.loader import statementloader  # 財報載入
+
+
+# 財務比率：把多個代號、多個期別的報表科目對齊成 (科目, 代號, 期別) 陣列後一次計算
+class ratios:
+    # 計算比率需要的科目（yfinance 的英文科目名稱）
+    items = {
+        "revenue": "Total Revenue",
+        "gross_profit": "Gross Profit",
+        "operating_income": "Operating Income",
+        "net_income": "Net Income",
+        "ebitda": "EBITDA",
+        "total_assets": "Total Assets",
+        "equity": "Stockholders Equity",
+        "total_debt": "Total Debt",
+        "current_assets": "Current Assets",
+        "current_liabilities": "Current Liabilities",
+        "inventory": "Inventory",
+        "operating_cash_flow": "Operating Cash Flow",
+        "free_cash_flow": "Free Cash Flow",
+    }
+    # 比率顯示名稱
+    names = {
+        "gross_margin": "毛利率(%)",
+        "operating_margin": "營業利益率(%)",
+        "net_margin": "淨利率(%)",
+        "ebitda_margin": "EBITDA利潤率(%)",
+        "revenue_growth": "營收成長率(%)",
+        "net_income_growth": "淨利成長率(%)",
+        "debt_to_equity": "負債權益比(%)",
+        "debt_to_assets": "負債資產比(%)",
+        "current_ratio": "流動比率",
+        "quick_ratio": "速動比率",
+        "roe": "股東權益報酬率(%)",
+        "roa": "資產報酬率(%)",
+        "cash_conversion": "現金轉換率",
+        "fcf_margin": "自由現金流量利潤率(%)",
+    }
+    # 最多保留的期別數
+    max_periods = 20
+
+    @staticmethod
+    def statements(symbols, quarterly=False, max_workers=8):
+        """同時載入多個代號的三張報表，回傳 {代號: 合併後的報表（列為科目、欄為期末日）}。"""
+        def load(symbol):
+            bundle = statementloader.load(symbol, annual=not quarterly, quarterly=quarterly)
+            prefix = "quarterly_" if quarterly else ""
+            frames = [
+                getattr(bundle, prefix + field)
+                for field in ("income_stmt", "balance_sheet", "cash_flow")
+            ]
+            frames = [f for f in frames if f is not None and not f.empty]
+            if not frames:
+                return None
+            merged = pd.concat(frames)
+            return merged[~merged.index.duplicated(keep="first")]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            loaded = dict(zip(symbols, executor.map(load, symbols)))
+        return {s: f for s, f in loaded.items() if f is not None}
+
+    @staticmethod
+    def align(statements, periods=None):
+        """把 {代號: 報表} 對齊成科目陣列 (科目, 代號, 期別) 與期末日陣列 (代號, 期別)。
+
+        各代號的會計年度結束日不同，因此以「由新到舊第幾期」對齊而不是以日期對齊。
+        """
+        periods = periods or ratios.max_periods
+        symbols = list(statements)
+        labels = list(ratios.items.values())
+        values = np.full((len(labels), len(symbols), periods), np.nan)
+        dates = np.full((len(symbols), periods), np.datetime64("NaT"), dtype="datetime64[ns]")
+        for j, symbol in enumerate(symbols):
+            statement = statements[symbol]
+            columns = sorted(pd.DatetimeIndex(statement.columns), reverse=True)[:periods]
+            frame = statement.reindex(index=labels, columns=columns)
+            values[:, j, : len(columns)] = frame.to_numpy(dtype=np.float64)
+            dates[j, : len(columns)] = np.asarray(columns, dtype="datetime64[ns]")
+        return symbols, values, dates
+
+    @staticmethod
+    def compute(values, lag=1):
+        """由科目陣列一次計算所有比率，回傳 {比率: (代號, 期別) 陣列}。
+
+        lag 為成長率比較的期數差（年報 1、季報 4 即為年增率）；
+        ROE/ROA 以本期與前一期的平均權益/資產計算，沒有前一期時使用本期。
+        """
+        v = dict(zip(ratios.items, values))
+
+        def div(a, b):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out = a / b
+            return np.where(np.isfinite(out), out, np.nan)
+
+        def shifted(a, n):
+            # 期別由新到舊排列，往後 n 期即為較早的期別
+            out = np.full_like(a, np.nan)
+            if n < a.shape[-1]:
+                out[..., :-n] = a[..., n:]
+            return out
+
+        def average(a):
+            prev = shifted(a, 1)
+            return np.where(np.isfinite(prev), (a + prev) / 2, a)
+
+        def growth(a):
+            prev = shifted(a, lag)
+            return div(a - prev, np.abs(prev)) * 100
+
+        revenue = v["revenue"]
+        return {
+            "gross_margin": div(v["gross_profit"], revenue) * 100,
+            "operating_margin": div(v["operating_income"], revenue) * 100,
+            "net_margin": div(v["net_income"], revenue) * 100,
+            "ebitda_margin": div(v["ebitda"], revenue) * 100,
+            "revenue_growth": growth(revenue),
+            "net_income_growth": growth(v["net_income"]),
+            "debt_to_equity": div(v["total_debt"], v["equity"]) * 100,
+            "debt_to_assets": div(v["total_debt"], v["total_assets"]) * 100,
+            "current_ratio": div(v["current_assets"], v["current_liabilities"]),
+            "quick_ratio": div(
+                v["current_assets"] - np.nan_to_num(v["inventory"]), v["current_liabilities"]
+            ),
+            "roe": div(v["net_income"], average(v["equity"])) * 100,
+            "roa": div(v["net_income"], average(v["total_assets"])) * 100,
+            "cash_conversion": div(v["operating_cash_flow"], v["net_income"]),
+            "fcf_margin": div(v["free_cash_flow"], revenue) * 100,
+        }
+
+    @staticmethod
+    def table(statements, lag=1, periods=None):
+        """計算所有代號、所有期別的比率，回傳長表（索引為 (代號, 期末日)，欄為比率）。"""
+        symbols, values, dates = ratios.align(statements, periods)
+        result = ratios.compute(values, lag)
+        n = values.shape[-1]
+        index = pd.MultiIndex.from_arrays(
+            [np.repeat(symbols, n), dates.ravel()], names=["代號", "期末日"]
+        )
+        frame = pd.DataFrame({k: a.ravel() for k, a in result.items()}, index=index)
+        # 去掉沒有資料的期別
+        return frame[~pd.isna(index.get_level_values(1))]
+
+    @staticmethod
+    def latest(table):
+        """每個代號最新一期的比率。"""
+        return table.groupby(level=0, sort=False).head(1).droplevel(1)
+
+    @staticmethod
+    def plot(symbols, quarterly=False, ratio="roe"):
+        """繪製同業財務比率比較：最新一期總表與 ratio 的歷史走勢。"""
+        statements = ratios.statements(symbols, quarterly)
+        missing = [s for s in symbols if s not in statements]
+        if missing:
+            st.warning(f"查無財報：{', '.join(missing)}")
+        if not statements:
+            return
+        table = ratios.table(statements, lag=4 if quarterly else 1)
+        table = table.rename(columns=ratios.names)
+        unit = "季" if quarterly else "年"
+
+        st.subheader(f"同業財務比率比較（最新一期/{unit}）")
+        st.dataframe(ratios.latest(table).round(2), use_container_width=True)
+
+        name = ratios.names[ratio]
+        history = table[name].reset_index()
+        fig = px.line(history, x="期末日", y=name, color="代號", markers=True)
+        st.subheader(f"{name}歷史走勢/{unit}")
+        st.plotly_chart(fig, use_container_width=True)
+        with st.expander(f"展開財務比率/{unit}"):
+            st.dataframe(table.round(2), use_container_width=True)
@@ -0,0 +1,103 @@
+# 資料分析
+import os
+import time
+
+import pandas as pd  # 資料處理
+
+from backend.cache import cache_path, atomic_write
+
+
+# 財報期別庫：每個代號、每種報表一個 Parquet 檔（列為期末日、欄為科目）。
+# 已結束的期別不會再變動，只有可能出現更新期別時才向上游確認，
+# 並保留上游已不再回傳的舊期別，累積超過 yfinance 的 4-5 期
+class statementstore:
+    # 報表欄位 -> 期別長度
+    period_length = {
+        "balance_sheet": pd.DateOffset(years=1),
+        "income_stmt": pd.DateOffset(years=1),
+        "cash_flow": pd.DateOffset(years=1),
+        "quarterly_balance_sheet": pd.DateOffset(months=3),
+        "quarterly_income_stmt": pd.DateOffset(months=3),
+        "quarterly_cash_flow": pd.DateOffset(months=3),
+    }
+    # 新期別已可能公布後，兩次向上游確認的最短間隔（秒）
+    recheck = 24 * 60 * 60
+
+    @staticmethod
+    def path(symbol, field):
+        folder = cache_path("statements", symbol)
+        folder.mkdir(exist_ok=True)
+        return folder / f"{field}.parquet"
+
+    @staticmethod
+    def load(symbol, field):
+        """讀取本地報表（格式與 yfinance 相同：列為科目、欄為期末日由新到舊），沒有則回傳 None。"""
+        path = statementstore.path(symbol, field)
+        if not path.exists():
+            return None
+        try:
+            periods = pd.read_parquet(path)
+        except Exception:
+            return None
+        return periods.sort_index(ascending=False).T
+
+    @staticmethod
+    def save(symbol, field, statement):
+        # Parquet 欄名須為字串，因此轉置成列為期末日、欄為科目存放
+        periods = statement.T
+        periods.index = pd.DatetimeIndex(periods.index, name="Period")
+        periods.columns = [str(c) for c in periods.columns]
+        atomic_write(statementstore.path(symbol, field), lambda p: periods.to_parquet(p))
+
+    @staticmethod
+    def needs_check(symbol, field, statement, now=None):
+        """是否需要向上游確認：沒有本地資料，或下一期已結束且距上次確認超過 recheck。"""
+        if statement is None or statement.empty:
+            return True
+        now = pd.Timestamp(now or pd.Timestamp.now()).tz_localize(None)
+        latest = pd.Timestamp(max(statement.columns))
+        if now < latest + statementstore.period_length[field]:
+            # 下一期尚未結束，不可能有新資料
+            return False
+        checked = statementstore.path(symbol, field).stat().st_mtime
+        return time.time() - checked >= statementstore.recheck
+
+    @staticmethod
+    def merge(stored, fresh):
+        """已存的期別保持不變，加入上游新的期別；科目順序以上游為主。"""
+        if stored is None or stored.empty:
+            return fresh
+        if fresh is None or fresh.empty:
+            return stored
+        new = [c for c in fresh.columns if c not in stored.columns]
+        if not new:
+            return stored
+        labels = list(dict.fromkeys([*fresh.index, *stored.index]))
+        merged = pd.concat([fresh[new], stored], axis=1).reindex(labels)
+        return merged[sorted(merged.columns, reverse=True)]
+
+    @staticmethod
+    def statement(symbol, field, fetch):
+        """取得報表：本地已是最新時直接讀檔，否則以 fetch() 向上游取得並合併保存。
+
+        上游失敗時退回本地資料，沒有本地資料則拋出例外。
+        """
+        stored = statementstore.load(symbol, field)
+        if not statementstore.needs_check(symbol, field, stored):
+            return stored
+        try:
+            fresh = fetch()
+        except Exception:
+            if stored is not None:
+                return stored
+            raise
+        if fresh is None or fresh.empty:
+            return stored if stored is not None else fresh
+        fresh.columns = pd.DatetimeIndex(fresh.columns)
+        merged = statementstore.merge(stored, fresh)
+        if merged is stored:
+            # 沒有新期別，只更新確認時間
+            os.utime(statementstore.path(symbol, field))
+        else:
+            statementstore.save(symbol, field, merged)
+        return merged
@@ -0,0 +1,165 @@
+# 資料處理
+import json
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+
+# 翻譯
+from deep_translator import GoogleTranslator
+import concurrent.futures
+
+from backend.cache import cache_dir
+
+
+# 翻譯記憶：以 (原文, 來源語言, 目標語言) 為鍵存在本地 SQLite，
+# 先查記憶、只把沒看過的字串送去翻譯；財報科目預先以 labels.<語言>.json 填入
+class translationmemory:
+    _lock = threading.Lock()
+    # 每個執行緒各自的翻譯器（GoogleTranslator 會把原文暫存在物件上，不可跨執行緒共用）
+    _local = threading.local()
+    # 本行程已填入預設詞彙的 (來源語言, 目標語言)
+    _seeded = set()
+
+    @staticmethod
+    def path():
+        return cache_dir("translation") / "memory.sqlite3"
+
+    @staticmethod
+    def _connect():
+        conn = sqlite3.connect(translationmemory.path(), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            " text TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL,"
+            " translation TEXT NOT NULL, PRIMARY KEY (text, source, target))"
+        )
+        return conn
+
+    @staticmethod
+    def seed_labels(target):
+        """讀取隨程式附帶的財報科目翻譯（labels.<target>.json），沒有則回傳空字典。"""
+        path = Path(__file__).with_name(f"labels.{target}.json")
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    @staticmethod
+    def _seed(source, target):
+        """首次使用某語言組合時把預設詞彙寫入記憶（已存在的不覆寫）。"""
+        if (source, target) in translationmemory._seeded:
+            return
+        with translationmemory._lock:
+            if (source, target) in translationmemory._seeded:
+                return
+            labels = translationmemory.seed_labels(target) if source == "en" else {}
+            if labels:
+                with closing(translationmemory._connect()) as conn, conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO memory VALUES (?, ?, ?, ?)",
+                        [(text, source, target, tran) for text, tran in labels.items()],
+                    )
+            translationmemory._seeded.add((source, target))
+
+    @staticmethod
+    def lookup(texts, source="en", target="zh-TW"):
+        """查詢記憶，回傳 {原文: 譯文}（只包含查得到的）。"""
+        translationmemory._seed(source, target)
+        texts = list(dict.fromkeys(texts))
+        found = {}
+        with closing(translationmemory._connect()) as conn:
+            # SQLite 預設最多 999 個參數，分段查詢
+            for i in range(0, len(texts), 500):
+                chunk = texts[i : i + 500]
+                rows = conn.execute(
+                    "SELECT text, translation FROM memory WHERE source = ? AND target = ?"
+                    f" AND text IN ({','.join('?' * len(chunk))})",
+                    [source, target, *chunk],
+                )
+                found.update(rows)
+        return found
+
+    @staticmethod
+    def store(translations, source="en", target="zh-TW"):
+        """把 {原文: 譯文} 寫入記憶。"""
+        if not translations:
+            return
+        with closing(translationmemory._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO memory VALUES (?, ?, ?, ?)",
+                [(text, source, target, tran) for text, tran in translations.items()],
+            )
+
+    # 翻譯服務單次請求的字數上限
+    batch_chars = 4500
+
+    @staticmethod
+    def _translator(source, target):
+        """取得目前執行緒的翻譯器。"""
+        translators = translationmemory._local.__dict__.setdefault("translators", {})
+        translator = translators.get((source, target))
+        if translator is None:
+            translator = translators[(source, target)] = GoogleTranslator(source=source, target=target)
+        return translator
+
+    @staticmethod
+    def _translate_one(text, source, target):
+        try:
+            return translationmemory._translator(source, target).translate(text)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _batches(texts):
+        """把字串依 batch_chars 分組（同組以換行串接送出），本身含換行的字串單獨一組。"""
+        batch, size = [], 0
+        for text in texts:
+            if "\n" in text:
+                yield [text]
+                continue
+            if batch and size + len(text) + 1 > translationmemory.batch_chars:
+                yield batch
+                batch, size = [], 0
+            batch.append(text)
+            size += len(text) + 1
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _translate_batch(batch, source, target):
+        """以一次請求翻譯一組字串（使用目前執行緒的翻譯器）；回傳行數不符或失敗時改為逐字翻譯。"""
+        if len(batch) > 1:
+            try:
+                translator = translationmemory._translator(source, target)
+                lines = translator.translate("\n".join(batch)).split("\n")
+                if len(lines) == len(batch):
+                    return [line.strip() for line in lines]
+            except Exception:
+                pass
+        return [translationmemory._translate_one(text, source, target) for text in batch]
+
+    @staticmethod
+    def translate(texts, source="en", target="zh-TW"):
+        """翻譯字串串列（順序不變）：先查記憶，沒看過的才分批呼叫翻譯服務並寫回記憶。
+
+        翻譯失敗的字串保留原文且不寫入記憶，下次會再嘗試。
+        """
+        texts = list(texts)
+        known = translationmemory.lookup(texts, source, target)
+        unseen = [t for t in dict.fromkeys(texts) if t not in known and t.strip()]
+        if unseen:
+            batches = list(translationmemory._batches(unseen))
+            # 多個批次時以多執行緒同時送出
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                results = executor.map(
+                    lambda b: translationmemory._translate_batch(b, source, target), batches
+                )
+                new = {
+                    text: tran
+                    for batch, trans in zip(batches, results)
+                    for text, tran in zip(batch, trans)
+                    if tran
+                }
+            translationmemory.store(new, source, target)
+            known.update(new)
+        return [known.get(t, t) for t in texts]
@@ -1,12 +1,9 @@
 # 資料分析
 import pandas as pd  # 資料處理
 
-# 資料擷取與網路相關
-import yfinance as yf  # 股票數據
-
 # 翻譯
-from deep_translator import GoogleTranslator
-import concurrent.futures
+from backend.finrepot.planner import translationplan  # 翻譯規劃
+from backend.finrepot.loader import statementloader  # 財報載入
 
 # Streamlit 前端框架
 import streamlit as st  # Streamlit 模組
@@ -21,44 +18,6 @@ class financialreport_y:
         self.income_stmt = None
         self.cash_flow = None
 
-    # 多進程翻譯函數
-    def tran(self, texts):
-        translator = GoogleTranslator(source="en", target=self.target_language)
-        # 使用多進程進行批量翻譯
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            tran = list(executor.map(translator.translate, texts))
-        return tran
-
-    # 使用多進程翻譯DataFrame的列名和索引名
-    def tran_df(self, df):
-        if df is not None and not df.empty:
-            # 多進程翻譯列名
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = pd.MultiIndex.from_tuples(
-                    [
-                        tuple(self.tran([str(col) for col in level]))
-                        for level in df.columns.levels
-                    ]
-                )
-            else:
-                df.columns = self.tran([str(col) for col in df.columns])
-
-            # 多進程翻譯索引名
-            if isinstance(df.index, pd.MultiIndex):
-                df.index = pd.MultiIndex.from_tuples(
-                    [
-                        tuple(self.tran([str(idx) for idx in level]))
-                        for level in df.index.levels
-                    ]
-                )
-            else:
-                df.index = self.tran([str(idx) for idx in df.index])
-
-            # 處理重複的列名
-            df = self.remove_col(df)
-
-        return df
-
     # 處理重複的列名
     def remove_col(self, df):
         cols = pd.Series(df.columns)
@@ -67,22 +26,31 @@ class financialreport_y:
             df.columns = cols
         return df
 
-    # 獲取財務報表
-    def get_financial(self):
-        try:
-            stock = yf.Ticker(self.symbol)
-            self.balance_sheet = stock.balance_sheet
-            self.income_stmt = stock.income_stmt
-            self.cash_flow = stock.cashflow
-        except Exception as e:
-            st.error(f"獲取財務報表發生錯誤：{str(e)}")
-            self.balance_sheet, self.income_stmt, self.cash_flow = None, None, None
+    # 獲取財務報表（三張報表同時請求；可傳入已載入的 statementbundle）
+    def get_financial(self, bundle=None):
+        if bundle is None:
+            bundle = statementloader.load(self.symbol, annual=True)
+        self.balance_sheet = bundle.balance_sheet
+        self.income_stmt = bundle.income_stmt
+        self.cash_flow = bundle.cash_flow
+        for field in statementloader.annual:
+            if field in (bundle.errors or {}):
+                st.error(f"獲取財務報表發生錯誤：{bundle.errors[field]}")
 
     # 翻譯財務報表
     def tran_financial(self):
-        self.balance_sheet = self.tran_df(self.balance_sheet)
-        self.income_stmt = self.tran_df(self.income_stmt)
-        self.cash_flow = self.tran_df(self.cash_flow)
+        # 三張報表的標籤合併後一次翻譯
+        (
+            self.balance_sheet,
+            self.income_stmt,
+            self.cash_flow,
+        ) = [
+            self.remove_col(df) if df is not None and not df.empty else df
+            for df in translationplan.apply(
+                [self.balance_sheet, self.income_stmt, self.cash_flow],
+                self.target_language,
+            )
+        ]
 
     # 顯示財務報表
     def display_financial(self):
@@ -8,12 +8,18 @@ from backend.data.cominfo import *
 from backend.data.holding import *
 from backend.data.news import *
 from backend.data.option import *
+from backend.data.optionstore import *
+from backend.data.optionanalytics import *
 from backend.data.plotindex import *
 from backend.data.tradedata import *
+from backend.data.warmcache import *
+from backend.data.watchlist import *
+from backend.data.fundamentals import *
 
 from backend.finrepot.q import *
 from backend.finrepot.y import *
 from backend.finrepot.sec import *
+from backend.finrepot.ratios import *
 
 
 
@@ -37,6 +43,8 @@ def app():
             "公司基本資訊",
             "公司財報",
             "交易數據",
+            "自選股",
+            "篩選",
             "期權數據",
             "SEC文件",
             "機構買賣",
@@ -83,12 +91,17 @@ def app():
             period = "max"
             time = "全部"
                     
+        # 背景定時預先計算；有新鮮結果時直接使用，否則所有面板共用一次批次取得的收盤價
+        warmcache.start()
+        precomputed = warmcache.load(period)
+        panel = precomputed["panel"] if precomputed else plotindex.fetch_panel(period)
+
         # 繪製大盤指數
-        pltindex = plotindex(period, time, plot_type="index")
+        pltindex = plotindex(period, time, plot_type="index", panel=panel, precomputed=precomputed)
         pltindex.plot()
 
         # 繪製海外大盤
-        pltforeign = plotindex(period, time, plot_type="foreign")
+        pltforeign = plotindex(period, time, plot_type="foreign", panel=panel, precomputed=precomputed)
         pltforeign.plot()
 
     elif options == "公司基本資訊":
@@ -97,32 +110,43 @@ def app():
         if middle.button("查詢", use_container_width=True):
             if symbol:
                 company = cominfo(symbol)
-    
-                # 獲取地址資訊
-                address = company.com_info["address1"]
-                city = company.com_info["city"]
-                country = company.com_info["country"]
-    
-                # 獲取公司位置
-                location = company.get_location(address, city, country)
-    
+                info = company.com_info
+
+                # 在背景取得公司位置，先顯示公司資訊
+                location = company.locate_async(
+                    info.get("address1"), info.get("city"), info.get("country")
+                )
+
                 # 顯示翻譯後的資訊
                 company.display_categorized_info()
-    
-                # 顯示地圖
+
+                # 顯示地圖（定位完成後填入）
+                st.subheader(f"{symbol}-位置")
+                placeholder = st.empty()
+                placeholder.info("定位中...")
+                try:
+                    location = location.result(timeout=30)
+                except Exception:
+                    location = None
                 if location:
-                    st.subheader(f"{symbol}-位置")
-                    company.display_map(location,company)
+                    with placeholder.container():
+                        company.display_map(location, company)
                 else:
-                    st.error(f"無法獲取{symbol}位置。")
+                    placeholder.error(f"無法獲取{symbol}位置。")
 
     elif options == "公司財報":
         with st.expander("展開輸入參數"):
-            time_range = st.selectbox("選擇時長", ["年報", "季報"])
-            if time_range == "年報":
-                symbol = st.text_input("輸入美股代碼").upper()
-            elif time_range == "季報":
-                symbol = st.text_input("輸入美股代碼").upper()
+            time_range = st.selectbox("選擇時長", ["年報", "季報", "年報與季報", "同業比率比較"])
+            symbol = st.text_input("輸入美股代碼").upper()
+            if time_range == "同業比率比較":
+                peers = st.text_input("輸入同業代碼（以逗號或空白分隔）", "MSFT, GOOGL, AMZN")
+                unit = st.selectbox("年報/季報", ["年報", "季報"])
+                ratio = st.selectbox(
+                    "選擇比率",
+                    list(ratios.names),
+                    format_func=lambda k: ratios.names[k],
+                    index=list(ratios.names).index("roe"),
+                )
         left, middle, right = st.columns(3)
         if middle.button("查詢",use_container_width=True):
             if time_range == "年報":
@@ -135,6 +159,21 @@ def app():
                 translator_quarterly.get_financial_q()
                 translator_quarterly.tran_financial_q()
                 translator_quarterly.display_financial_q()
+            elif time_range == "年報與季報":
+                # 年報與季報共六張報表同時請求，標籤合併後一次翻譯
+                bundle = statementloader.translate(
+                    statementloader.load(symbol, annual=True, quarterly=True)
+                )
+                translator = financialreport_y(symbol)
+                translator.get_financial(bundle)
+                translator.display_financial()
+                translator_quarterly = financialreport_q(symbol)
+                translator_quarterly.get_financial_q(bundle)
+                translator_quarterly.display_financial_q()
+            elif time_range == "同業比率比較":
+                symbols = watchlist.parse_symbols(f"{symbol} {peers}")
+                if symbols:
+                    ratios.plot(symbols, quarterly=unit == "季報", ratio=ratio)
 
     elif options == "交易數據":
         with st.expander("展開輸入參數"):
@@ -230,12 +269,64 @@ def app():
                     with col4:
                         st.metric(f"{time_range}最低價", f"${lowest_price:.2f}")
                     st.subheader(f"{symbol}-{time_range}K線圖表")
-                    tradedata.plot_kline(stock_data)
+                    tradedata.plot_kline(
+                        stock_data,
+                        tradedata.getindicators(symbol, stock_data),
+                        symbol=symbol,
+                    )
                 else:
                     st.error(f"查無{symbol}數據")
                 with st.expander(f"展開{symbol}-{time_range}數據"):
                     st.dataframe(stock_data)
           
+    elif options == "自選股":
+        with st.expander("展開輸入參數"):
+            text = st.text_area("輸入美股代碼（以逗號或空白分隔）", "AAPL, MSFT, NVDA, GOOGL, AMZN")
+            time = st.selectbox(
+                "選擇時長",
+                ["1個月", "3個月", "6個月", "年初至今", "1年", "2年", "5年", "10年", "全部"],
+            )
+            period = {
+                "1個月": "1mo",
+                "3個月": "3mo",
+                "6個月": "6mo",
+                "年初至今": "ytd",
+                "1年": "1y",
+                "2年": "2y",
+                "5年": "5y",
+                "10年": "10y",
+                "全部": "max",
+            }[time]
+        left, middle, right = st.columns(3)
+        if middle.button("查詢", use_container_width=True):
+            symbols = watchlist.parse_symbols(text)
+            if symbols:
+                watchlist.plot(symbols, period, time)
+
+    elif options == "篩選":
+        table = fundamentals.load()
+        with st.expander("更新基本面資料庫"):
+            text = st.text_area("輸入要更新的美股代碼（以逗號或空白分隔）")
+            if st.button("更新", use_container_width=True):
+                symbols = watchlist.parse_symbols(text)
+                if symbols:
+                    with st.spinner("更新中..."):
+                        updated = fundamentals.update(symbols)
+                    st.success(f"已更新 {len(updated)} 檔")
+                    table = fundamentals.load()
+        st.caption(f"資料庫共 {len(table)} 檔")
+        with st.expander("展開篩選條件", expanded=True):
+            sector = st.multiselect("部門", list(table["sector"].cat.categories))
+            industry = st.multiselect("行業", list(table["industry"].cat.categories))
+            conditions = st.text_area(
+                "數值條件（每行一個，例如 debtToEquity < 50）",
+                "debtToEquity < 50\nfreeCashflow > 1000000000",
+            )
+            sort = st.selectbox("排序欄位", ["marketCap", *[c for c in table.columns if c != "marketCap"]])
+        left, middle, right = st.columns(3)
+        if middle.button("篩選", use_container_width=True):
+            fundamentals.plot(conditions, sector, industry, sort)
+
     elif options == "期權數據":
         if "symbol" not in st.session_state:
             st.session_state.symbol = ""
@@ -255,19 +346,46 @@ def app():
             st.subheader(f"{symbol} 期權到期日")
             st.table(df)
     
-            date = st.date_input("選擇日期（請依照上面日期選擇）")
-            date_str = date.strftime("%Y-%m-%d")  # 將日期轉換為字符串進行比較
+            mode = st.radio("查詢方式", ["單一到期日", "全部到期日"], horizontal=True)
+            if mode == "全部到期日":
+                with st.spinner("取得所有到期日的期權鏈..."):
+                    surface = option.plot_surface()
+                    optionstore.save(symbol, surface)  # 記錄當天快照
+                    surface = option.add_greeks(surface)
+                if not surface.empty:
+                    st.subheader(f"{symbol} 期權彙總分析")
+                    optionanalytics.plot(surface, option.spot())
+
+                    st.subheader(f"{symbol} 全部期權")
+                    st.dataframe(option.tran_col(surface.copy()))
+
+                    st.subheader(f"{symbol} 合約歷史快照")
+                    contract = st.selectbox("選擇合約", surface["contractSymbol"].astype(str).unique())
+                    history = optionstore.contract(symbol, contract)
+                    if len(history) > 1:
+                        st.line_chart(history["openInterest"].rename("未平倉量"))
+                        st.line_chart(history["impliedVolatility"].rename("隱含波動率"))
+                    else:
+                        st.info("快照累積兩天以上才會顯示歷史走勢")
+            else:
+                date = st.date_input("選擇日期（請依照上面日期選擇）")
+                date_str = date.strftime("%Y-%m-%d")  # 將日期轉換為字符串進行比較
     
-            if date_str in option_dates:
-                st.subheader(f"{symbol}看漲期權(到期日：{date_str})")
-                calls_df = option.options_calls_date(date_str)
-                st.dataframe(option.tran_col(calls_df))
+                if date_str in option_dates:
+                    st.subheader(f"{symbol}看漲期權(到期日：{date_str})")
+                    calls_df = option.add_greeks(option.options_calls_date(date_str), "call", date_str)
+                    st.dataframe(option.tran_col(calls_df))
     
-                st.subheader(f"{symbol}看跌期權(到期日：{date_str})")
-                puts_df = option.options_puts_date(date_str)
-                st.dataframe(option.tran_col(puts_df))
-            else:
-                st.error("查無相關日期期權")
+                    st.subheader(f"{symbol}看跌期權(到期日：{date_str})")
+                    puts_df = option.add_greeks(option.options_puts_date(date_str), "put", date_str)
+                    st.dataframe(option.tran_col(puts_df))
+
+                    st.subheader(f"{symbol}期權彙總分析(到期日：{date_str})")
+                    optionanalytics.plot(
+                        option.add_greeks(option.expiry_frame(date_str)), option.spot(date_str)
+                    )
+                else:
+                    st.error("查無相關日期期權")
     
             # 新增重新查詢股票按鈕
             left, middle, right = st.columns(3)
@@ -0,0 +1,30 @@
+import pytest
+
+from backend.data import cominfo as company
+from backend.data.geobatch import geobatch
+
+
+def run_main(monkeypatch, argv):
+    """執行 main 但不實際查詢，回傳交給 run 的服務清單。"""
+    captured = {}
+
+    def run(universe, providers, retry_missing=False, limit=None):
+        captured["providers"] = providers
+
+    monkeypatch.setattr(geobatch, "run", staticmethod(run))
+    assert geobatch.main(argv) == 0
+    return dict(captured["providers"])
+
+
+@pytest.mark.parametrize("delay", [1.0, 2.0])
+def test_min_delay_sets_nominatim_limiter(monkeypatch, delay):
+    providers = run_main(monkeypatch, ["universe.txt", "--min-delay", str(delay)])
+    assert providers["nominatim"].min_delay_seconds == delay
+
+
+def test_default_server_comes_from_cominfo(monkeypatch):
+    providers = run_main(monkeypatch, ["universe.txt", "--no-fallback"])
+    assert list(providers) == ["nominatim"]
+    locator = providers["nominatim"].func.__self__
+    assert locator.domain == company.NOMINATIM_DOMAIN
+    assert locator.scheme == company.NOMINATIM_SCHEME
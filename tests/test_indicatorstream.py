@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backend.cache
+from backend.data.indicators import indicators, indicatorstream
+
+
+@pytest.fixture(autouse=True)
+def cache_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend.cache, "CACHE_ROOT", tmp_path)
+    indicatorstream._frames.clear()
+
+
+def make_history(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(size=n))
+    index = pd.bdate_range("1990-01-01", periods=n)
+    return pd.DataFrame(
+        {"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000},
+        index=index,
+    )
+
+
+def count_step_rows(monkeypatch):
+    """記錄每次 step 收到的K棒數與接續用的尾端長度。"""
+    calls = []
+    step = indicatorstream.step
+
+    def spy(state, bars):
+        tail = 0 if state is None else len(state["tails"]["Close"])
+        calls.append(len(bars) + tail)
+        return step(state, bars)
+
+    monkeypatch.setattr(indicatorstream, "step", staticmethod(spy))
+    return calls
+
+
+def test_frame_matches_full_compute():
+    history = make_history(500)
+    frame = indicatorstream.frame("AAA", history)
+    expected = indicators.compute(history)
+    pd.testing.assert_frame_equal(frame, expected, check_exact=False, rtol=1e-9)
+
+    # 新增一根K棒後接續計算，結果仍與全量計算一致
+    longer = make_history(501)
+    frame = indicatorstream.frame("AAA", longer)
+    pd.testing.assert_frame_equal(frame, indicators.compute(longer), check_exact=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize("length", [1_000, 8_000])
+def test_update_cost_does_not_depend_on_history_length(length, monkeypatch):
+    history = make_history(length + 3)
+    indicatorstream.frame("AAA", history.iloc[:length])
+    calls = count_step_rows(monkeypatch)
+
+    rows = indicatorstream.update("AAA", history)
+
+    # 只讀取保存的尾端與狀態之後的K棒（上次最後一根加上 3 根新K棒）
+    assert calls == [indicatorstream.tail_size + 4]
+    assert list(rows.index) == list(history.index[-4:])
+    expected = indicators.compute(history).iloc[-4:]
+    pd.testing.assert_frame_equal(rows, expected, check_exact=False, rtol=1e-9)
+
+
+def test_update_without_state_returns_none():
+    assert indicatorstream.update("AAA", make_history(500)) is None
@@ -0,0 +1,57 @@
+import datetime
+import types
+from collections import OrderedDict
+
+import pytest
+
+import backend.data.Option as option_module
+from backend.data.Option import Option
+
+
+class FakeTicker:
+    """記錄建立次數的 yf.Ticker 替身，options 與真實 Ticker 一樣在建立後固定不變。"""
+
+    created = []
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        today = datetime.date.today()
+        # 最後一個到期日依建立次數變化，用來分辨是否為新的 Ticker
+        days = (-1, 0, 7, 30 + len(FakeTicker.created))
+        self.options = tuple((today + datetime.timedelta(days=d)).isoformat() for d in days)
+        FakeTicker.created.append(symbol)
+
+
+@pytest.fixture(autouse=True)
+def fake_ticker(monkeypatch):
+    FakeTicker.created = []
+    monkeypatch.setattr(option_module.yf, "Ticker", FakeTicker)
+    monkeypatch.setattr(Option, "_tickers", OrderedDict())
+    monkeypatch.setattr(Option, "_dates", OrderedDict())
+
+
+def test_dates_skip_expired_and_refetch_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(option_module, "time", types.SimpleNamespace(time=lambda: now[0]))
+    option = Option("AAA")
+
+    dates = option.get_option_dates()
+    today = datetime.date.today().isoformat()
+    assert dates[0] == today
+    assert all(d >= today for d in dates)
+    assert option.get_option_dates() == dates
+    assert len(FakeTicker.created) == 1
+
+    # 超過 ttl 後改用新的 yf.Ticker 重新取得到期日
+    now[0] += Option.ttl
+    refreshed = option.get_option_dates()
+    assert len(FakeTicker.created) == 2
+    assert refreshed[-1] != dates[-1]
+
+
+def test_symbol_caches_are_bounded(monkeypatch):
+    monkeypatch.setattr(Option, "max_symbols", 3)
+    for symbol in ("A", "B", "C", "D", "E"):
+        Option(symbol).get_option_dates()
+    assert list(Option._tickers) == ["C", "D", "E"]
+    assert list(Option._dates) == ["C", "D", "E"]
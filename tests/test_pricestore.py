@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backend.cache
+from backend.data.pricestore import pricestore
+
+
+@pytest.fixture(autouse=True)
+def cache_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend.cache, "CACHE_ROOT", tmp_path)
+
+
+def make_prices(n, start="2024-01-01"):
+    close = 100 + np.arange(n, dtype=np.float64)
+    index = pd.bdate_range(start, periods=n)
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1000.0}, index=index)
+
+
+def store_stale(symbol, data):
+    pricestore.save(symbol, data)
+    os.utime(pricestore.path(symbol), (0, 0))
+
+
+def test_history_many_keeps_stale_when_batch_fails(monkeypatch):
+    data = make_prices(10)
+    store_stale("AAA", data)
+
+    def fail(symbols, **kwargs):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(pricestore, "_download_batch", staticmethod(fail))
+    result = pricestore.history_many(["AAA"])
+
+    pd.testing.assert_frame_equal(result["AAA"], pricestore.load("AAA"))
+    assert not pricestore.is_fresh("AAA")
+
+
+def test_history_many_marks_fresh_only_when_symbol_returned(monkeypatch):
+    data = make_prices(10)
+    store_stale("AAA", data)
+    store_stale("BBB", data)
+
+    # AAA 下載成功但沒有新K棒，BBB 不在批次結果中
+    tail = pricestore.load("AAA").iloc[-1:]
+    monkeypatch.setattr(pricestore, "_download_batch", staticmethod(lambda symbols, **kwargs: {"AAA": tail}))
+    result = pricestore.history_many(["AAA", "BBB"])
+
+    assert len(result["AAA"]) == len(result["BBB"]) == 10
+    assert pricestore.is_fresh("AAA")
+    assert not pricestore.is_fresh("BBB")